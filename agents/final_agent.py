@@ -1,5 +1,6 @@
 from pydantic_ai import Agent
 from dataclasses import dataclass
+from typing import List
 from model import get_openai_model
 
 
@@ -43,7 +44,7 @@ Watch the football match at Stadium XYZ. Stay at Sports Inn. Use shuttle bus.
 Wait for the user to choose which plan to save to their calendar by responding with the plan number.
 """
 
-model = get_openai_model()
+model = get_openai_model("final")
 
 
 get_final_agent = Agent(
@@ -51,3 +52,26 @@ get_final_agent = Agent(
     system_prompt=system_prompt,
     retries=1
 )
+
+
+summary_system_prompt = """
+You write short plan summaries for itineraries that have already been assembled.
+
+You receive a JSON list of plan skeletons. Each has an activity, its location and times, and optionally a stay, a transport option, the total cost and the travel time.
+
+Your output:
+- Return exactly one summary per skeleton, in the same order.
+- Each summary is 1–2 friendly sentences covering the activity, where to stay and how to get there when given, and the total cost if known.
+- Mention any caveats listed for a plan.
+- You may also receive the stay and transport agents' suggestions as free text. When a skeleton has no stay or transport but the plan needs one, mention the best fitting option from those suggestions. Ignore them for online activities.
+- Do not invent venues, prices or times that are not in the skeleton.
+"""
+
+
+# Only writes summaries for locally assembled plan skeletons (see agents/plan_assembly.py)
+get_plan_summary_agent = Agent(
+    model=get_openai_model("plan_summary"),
+    system_prompt=summary_system_prompt,
+    output_type=List[str],
+    retries=1
+)
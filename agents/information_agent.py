@@ -3,12 +3,13 @@ from pydantic_ai import Agent
 from typing import Optional
 from datetime import date
 from model import get_openai_model
+from prompts import assemble_system_prompt
 import json 
 import os
 import sys
 
 
-model = get_openai_model()
+model = get_openai_model("userinfo")
 
 
 class UserInfo(BaseModel):
@@ -25,16 +26,16 @@ class UserInfo(BaseModel):
     location: str = Field(description="City or location where the booking is intended.")
     user_date_first: str = Field(description="Start date of the booking or event (in YYYY-MM-DD format).")
     user_date_last: Optional[str] = Field(description="End date if the user provided a date range (in YYYY-MM-DD format).")
+    origin: Optional[str] = Field(default=None, description="City the user is travelling from, if they mentioned one; null otherwise.")
     all_details_given: bool = Field(description="True if all required fields are filled for the detected intent.")
+    response: str = Field(description="Message shown to the user: ask for any missing details, or confirm what was understood.")
 
 
 today = date.today().isoformat()
 
-system_prompt = f"""
+instructions = """
 You are an assistant that classifies booking intent and extracts details.
 
-Today's date is {today}. Interpret relative phrases like "this Friday" or "next weekend" accordingly.
-
 Your task:
 - Classify intent as one of the following:
   - book_game_venue → when the user wants to book a ground, court, or sports facility to play
@@ -76,13 +77,23 @@ If the user provides a date range (e.g., "between June 10 and June 12"):
 
 If only one date is mentioned, set user_date_first and leave user_date_last as null.
 
+If the user mentions where they are travelling from (e.g., "coming from Pune"), set origin to that city; otherwise leave it null. Origin is optional: never ask for it or hold back 'all_details_given' because of it.
+
 Only set 'all_details_given' to true if:
 - intent is clearly identified AND
 - all required fields for that intent are present.
 
+Always fill 'response' with a short message for the user, asking for anything that is missing.
+
 Return the extracted details along with the classified intent.
 """
 
+# The date changes daily, so it goes after the static instructions to keep the prefix cacheable
+system_prompt = assemble_system_prompt(
+    instructions,
+    context=f"Today's date is {today}. Interpret relative phrases like 'this Friday' or 'next weekend' accordingly.",
+)
+
 
 get_userinfo_agent = Agent(
     model,
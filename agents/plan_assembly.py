@@ -0,0 +1,226 @@
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, time
+from typing import Any, Dict, List, Optional
+import itertools
+import json
+
+
+TOP_K = 3
+MAX_PLANS = 4
+
+COST_KEYS = ("price", "fee", "cost", "fare", "price_per_night", "rate")
+
+
+@dataclass
+class PlanSkeleton:
+    title: str
+    activity: Dict[str, Any]
+    location: str
+    start_time: str
+    end_time: str
+    stay: Optional[Dict[str, Any]] = None
+    transport: Optional[Dict[str, Any]] = None
+    total_cost: Optional[float] = None
+    travel_hours: Optional[float] = None
+    issues: List[str] = field(default_factory=list)
+
+    def calendar_entry(self, description: str) -> Dict[str, str]:
+        """The hidden calendar JSON entry the final agent used to write by hand."""
+        return {
+            "title": self.title,
+            "description": description,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "location": self.location,
+        }
+
+
+def parse_candidates(output: Any) -> List[Dict[str, Any]]:
+    """Best-effort parse of a branch output into a list of candidate dicts."""
+    if isinstance(output, str):
+        text = output.strip()
+        # Agents sometimes wrap JSON in a fenced code block
+        if text.startswith("```"):
+            text = text.strip("`").split("\n", 1)[-1]
+        try:
+            output = json.loads(text)
+        except json.JSONDecodeError:
+            return []
+    if isinstance(output, dict):
+        output = [output]
+    if isinstance(output, list):
+        return [item for item in output if isinstance(item, dict)]
+    return []
+
+
+def _cost(candidate: Optional[Dict[str, Any]]) -> Optional[float]:
+    if not candidate:
+        return None
+    for key in COST_KEYS:
+        try:
+            return float(candidate[key])
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+
+def _in_range(day: str, first: str, last: Optional[str]) -> bool:
+    try:
+        return date.fromisoformat(first) <= date.fromisoformat(day[:10]) <= date.fromisoformat(last or first)
+    except ValueError:
+        return False
+
+
+def _nights(first: str, last: Optional[str]) -> int:
+    try:
+        return max((date.fromisoformat(last or first) - date.fromisoformat(first)).days, 0)
+    except ValueError:
+        return 0
+
+
+def _hour(value: Any, default: int) -> int:
+    """An hour of the day from an int or a string like "18" / "18:00", or default if unusable."""
+    try:
+        hour = int(str(value).strip().split(":")[0])
+    except (TypeError, ValueError):
+        return default
+    return hour if 0 <= hour <= 23 else default
+
+
+def _datetime(value: Any, day: str) -> Optional[str]:
+    """An ISO datetime from a full datetime, or from a time of day ("10:00") on day; None if unusable."""
+    text = str(value).strip()
+    try:
+        return datetime.fromisoformat(text).isoformat()
+    except ValueError:
+        pass
+    try:
+        return datetime.combine(date.fromisoformat(day), time.fromisoformat(text)).isoformat()
+    except ValueError:
+        return None
+
+
+def _activity_times(activity: Dict[str, Any], first: str) -> tuple[str, str]:
+    start_day = str(activity.get("event_start_date") or activity.get("date") or first)[:10]
+    end_day = str(activity.get("event_end_date") or start_day)[:10]
+    if activity.get("start_time") and activity.get("end_time"):
+        start_time = _datetime(activity["start_time"], start_day)
+        end_time = _datetime(activity["end_time"], end_day)
+        if start_time and end_time:
+            return start_time, end_time
+    start_hour = _hour(activity.get("start_hour"), 9)
+    end_hour = _hour(activity.get("end_hour"), min(start_hour + 1, 23) if "start_hour" in activity else 18)
+    return f"{start_day}T{start_hour:02d}:00:00", f"{end_day}T{end_hour:02d}:00:00"
+
+
+def is_online(activity: Dict[str, Any]) -> bool:
+    return str(activity.get("format", "")).lower() == "online"
+
+
+def build_skeleton(
+    activity: Dict[str, Any],
+    stay: Optional[Dict[str, Any]],
+    transport: Optional[Dict[str, Any]],
+    user_details: Dict[str, Any],
+) -> PlanSkeleton:
+    first = user_details["user_date_first"]
+    last = user_details.get("user_date_last")
+    user_location = user_details.get("location", "")
+    location = str(activity.get("location") or activity.get("address") or user_location)
+    start_time, end_time = _activity_times(activity, first)
+
+    issues = []
+    if not _in_range(start_time, first, last):
+        issues.append(f"starts on {start_time[:10]}, outside {first} to {last or first}")
+    if not is_online(activity) and user_location and user_location.lower() not in location.lower():
+        issues.append(f"located in {location}, not {user_location}")
+
+    nights = _nights(first, last)
+    costs = [_cost(activity)]
+    if stay is not None:
+        stay_cost = _cost(stay)
+        costs.append(stay_cost * max(nights, 1) if stay_cost is not None else None)
+    if transport is not None:
+        costs.append(_cost(transport))
+    known_costs = [cost for cost in costs if cost is not None]
+
+    return PlanSkeleton(
+        title=str(activity.get("title") or activity.get("name") or "Planned activity"),
+        activity=activity,
+        location=location,
+        start_time=start_time,
+        end_time=end_time,
+        stay=stay,
+        transport=transport,
+        total_cost=round(sum(known_costs), 2) if known_costs else None,
+        travel_hours=transport.get("duration_hours") if transport else None,
+        issues=issues,
+    )
+
+
+def _spread(plans: List[PlanSkeleton]) -> List[PlanSkeleton]:
+    """Best plan per activity first, then the remaining combinations, keeping the order otherwise."""
+    firsts, seen = [], set()
+    for plan in plans:
+        if plan.title not in seen:
+            firsts.append(plan)
+            seen.add(plan.title)
+    return firsts + [plan for plan in plans if plan not in firsts]
+
+
+def assemble_plans(
+    user_details: Dict[str, Any],
+    activities: List[Dict[str, Any]],
+    stays: List[Dict[str, Any]],
+    transports: List[Dict[str, Any]],
+    top_k: int = TOP_K,
+    max_plans: int = MAX_PLANS,
+) -> List[PlanSkeleton]:
+    """Combine the top-k candidates of each branch into ranked itinerary skeletons.
+
+    Consistent plans (dates and location match the request) come first, then cheaper,
+    then shorter travel. Consistent plans are spread across activities before reusing
+    one; plans with caveats only fill the remaining slots. Online activities get no
+    stay or transport.
+    """
+    if not activities:
+        return []
+
+    skeletons = []
+    for activity in activities[:top_k]:
+        online = is_online(activity)
+        for stay, transport in itertools.product(
+            [None] if online else stays[:top_k] or [None],
+            [None] if online else transports[:top_k] or [None],
+        ):
+            skeletons.append(build_skeleton(activity, stay, transport, user_details))
+    skeletons.sort(key=lambda plan: (
+        len(plan.issues),
+        plan.total_cost if plan.total_cost is not None else float("inf"),
+        plan.travel_hours if plan.travel_hours is not None else float("inf"),
+    ))
+
+    consistent = [plan for plan in skeletons if not plan.issues]
+    with_caveats = [plan for plan in skeletons if plan.issues]
+    return (_spread(consistent) + _spread(with_caveats))[:max_plans]
+
+
+def skeleton_summary(plan: PlanSkeleton) -> Dict[str, Any]:
+    """The compact view of a skeleton the final agent writes a summary for."""
+    summary = asdict(plan)
+    summary.pop("issues")
+    if plan.issues:
+        summary["caveats"] = plan.issues
+    return {key: value for key, value in summary.items() if value is not None}
+
+
+def render_plans(plans: List[PlanSkeleton], summaries: List[str]) -> str:
+    """Numbered plans for the user followed by the hidden calendar JSON."""
+    lines = []
+    entries = []
+    for number, (plan, summary) in enumerate(zip(plans, summaries), start=1):
+        lines.append(f"Plan {number}: {plan.title}\n{summary.strip()}\n")
+        entries.append(plan.calendar_entry(summary.strip()))
+    lines.append(f"<!--\n{json.dumps(entries, indent=2)}\n-->")
+    lines.append("\nReply with the plan number you'd like to save to your calendar.")
+    return "\n".join(lines)
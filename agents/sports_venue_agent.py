@@ -1,13 +1,14 @@
 from pydantic_ai import Agent
-import mcp_client
+from config_registry import config_registry, mcp_pool
 from dataclasses import dataclass
-from typing import List
+from typing import List, Literal
 from dotenv import load_dotenv
 from model import get_openai_model
+from prompts import assemble_system_prompt, sorted_tools, prompt_cache_stats
 
 load_dotenv()
 
-model = get_openai_model()
+model = get_openai_model("venue")
 
 @dataclass
 class VenuePreferences:
@@ -17,11 +18,10 @@ class VenuePreferences:
     location_scope: Literal["nearby", "citywide", "any"]
     
 
-system_prompt = f"""
+system_prompt = """
 You are a sports venue search assistant that helps users discover venues for their preferred sports.
 
-Use the following tools to perform searches:
-{tool_descriptions}
+Use the tools listed below to perform searches.
 
 Your responsibilities:
 - Recommend suitable sports venues based on preferences like game type, location, time slot.
@@ -33,8 +33,13 @@ Respond clearly and helpfully, with a strong reasoning for your suggestions.
 """
 
     
-async def get_venue_agent():
-    client = mcp_client.MCPClient()
-    client.load_servers(str(CONFIG_FILE))
-    tools = await client.start()
-    return client, Agent(model=get_openai_model(), system_prompt=system_prompt, deps_type=VenuePreferences, tools=tools)   
\ No newline at end of file
+config_name = "venue"
+
+async def get_venue_agent(result_transform=None):
+    if not config_registry.has(config_name):
+        raise ValueError(f"No valid MCP config named '{config_name}' in {config_registry.config_dir}")
+    client = await mcp_pool.lease(config_name, result_transform=result_transform)
+    tools = sorted_tools(client.tools)
+    prompt = assemble_system_prompt(system_prompt, tools)
+    prompt_cache_stats.record_system_prompt("venue", prompt)
+    return client, Agent(model=get_openai_model("venue"), system_prompt=prompt, deps_type=VenuePreferences, tools=tools)   
\ No newline at end of file
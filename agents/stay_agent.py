@@ -1,12 +1,14 @@
 from pydantic_ai import Agent
-import mcp_client
+from config_registry import config_registry, mcp_pool
 from dataclasses import dataclass
-from typing import List, Literal
+from typing import List, Literal, Optional, Tuple
 from dotenv import load_dotenv
 from model import get_openai_model
+from agents.stay_ranking import rank_tool_result
+from prompts import assemble_system_prompt, sorted_tools, prompt_cache_stats
 
 load_dotenv()
-model = get_openai_model()
+model = get_openai_model("stay")
 
 # Dependencies: user stay preferences (can be extended later)
 @dataclass
@@ -16,29 +18,14 @@ class StayPreferences:
     preferred_amenities: List[str]
     max_budget: int
 
-# Load MCP tools from hotel/PG related config
-config_path = "./configs/stay.json"
+# MCP tools from the hotel/PG related config (configs/stay.json in the config registry)
+config_name = "stay"
 
 
 
-# Function to dynamically build prompt with tool descriptions
-def build_tool_descriptions(tools: list) -> str:
-    return "\n".join(
-        f"- {tool.name}: {tool.description or 'No description provided'}"
-        for tool in tools
-    )
-
-async def get_stay_agent():
-    client = mcp_client.MCPClient()
-    client.load_servers(config_path)
-    tools = await client.start()
-    tool_descriptions = build_tool_descriptions(tools),
-    system_prompt = f"""
+system_prompt = """
 You are a stay search assistant that helps users find accommodation options near sports venues or events **only when the event spans multiple days**.
 
-Use the following tools to search for stay options:
-{tool_descriptions}
-
 Responsibilities:
 - Suggest accommodation **only if the event is more than one day long**.
 - Use context preferences such as:
@@ -55,10 +42,29 @@ Instructions:
 
 Be clear, practical, and user-friendly in your suggestions.
 """
+
+
+async def get_stay_agent(
+    preferences: Optional[StayPreferences] = None,
+    venue: Optional[Tuple[float, float]] = None,
+    ranked_listings: Optional[List[dict]] = None,
+):
+    if not config_registry.has(config_name):
+        raise ValueError(f"No valid MCP config named '{config_name}' in {config_registry.config_dir}")
+
+    # Rank listings locally so only the top few reach the model; kept listings go to ranked_listings
+    result_transform = None
+    if preferences is not None:
+        result_transform = lambda result, arguments: rank_tool_result(result, preferences, venue=venue, collected=ranked_listings)
+
+    client = await mcp_pool.lease(config_name, result_transform=result_transform)
+    tools = sorted_tools(client.tools)
+    prompt = assemble_system_prompt(system_prompt, tools)
+    prompt_cache_stats.record_system_prompt("stay", prompt)
     
     agent = Agent(
         model=model,
-        system_prompt=system_prompt,
+        system_prompt=prompt,
         deps_type=StayPreferences,
         tools=tools,
         retries=2
@@ -0,0 +1,171 @@
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+
+import numpy as np
+from mcp.types import CallToolResult, TextContent
+
+
+# Relative weight of each component in the final score (higher score is better)
+SCORE_WEIGHTS = {
+    "price": 0.4,
+    "amenities": 0.35,
+    "distance": 0.25,
+}
+
+TOP_K = 5
+
+# Keys the stay MCP servers use for the listing fields we rank on
+PRICE_KEYS = ("price", "price_per_night", "rate")
+ROOM_TYPE_KEYS = ("room_type", "type", "category")
+AC_KEYS = ("ac", "has_ac", "is_ac")
+LISTING_LIST_KEYS = ("listings", "results", "stays", "hotels")
+
+
+def _first(listing: Dict[str, Any], keys: Tuple[str, ...], default: Any = None) -> Any:
+    for key in keys:
+        if listing.get(key) is not None:
+            return listing[key]
+    return default
+
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def encode_listings(
+    listings: List[Dict[str, Any]],
+    preferred_amenities: List[str],
+    venue: Optional[Tuple[float, float]] = None,
+) -> Dict[str, np.ndarray]:
+    """Encode listings as columnar arrays: price, AC flag, room type, amenity bitmask, distance."""
+    amenity_bits = {
+        amenity.lower(): np.uint64(1) << np.uint64(i)
+        for i, amenity in enumerate(preferred_amenities[:64])
+    }
+
+    n = len(listings)
+    price = np.full(n, np.nan)
+    ac = np.zeros(n, dtype=np.int8)  # 1 = AC, -1 = non-AC, 0 = unknown
+    room_type = np.empty(n, dtype=object)
+    amenities = np.zeros(n, dtype=np.uint64)
+    distance = np.full(n, np.nan)
+    lat = np.full(n, np.nan)
+    lon = np.full(n, np.nan)
+
+    for i, listing in enumerate(listings):
+        price[i] = _as_float(_first(listing, PRICE_KEYS))
+        has_ac = _first(listing, AC_KEYS)
+        if has_ac is not None:
+            ac[i] = 1 if str(has_ac).lower() in ("true", "1", "yes", "ac") else -1
+        room_type[i] = str(_first(listing, ROOM_TYPE_KEYS, "")).lower()
+        for amenity in listing.get("amenities") or []:
+            amenities[i] |= amenity_bits.get(str(amenity).lower(), np.uint64(0))
+        distance[i] = _as_float(listing.get("distance_km"))
+        lat[i] = _as_float(listing.get("lat", listing.get("latitude")))
+        lon[i] = _as_float(listing.get("lon", listing.get("longitude")))
+
+    if venue is not None:
+        # Fill missing distances from coordinates in one vectorized haversine pass
+        vlat, vlon = np.radians(venue)
+        rlat, rlon = np.radians(lat), np.radians(lon)
+        h = np.sin((rlat - vlat) / 2) ** 2 + np.cos(vlat) * np.cos(rlat) * np.sin((rlon - vlon) / 2) ** 2
+        computed = 2 * 6371.0 * np.arcsin(np.sqrt(h))
+        distance = np.where(np.isnan(distance), computed, distance)
+
+    return {
+        "price": price,
+        "ac": ac,
+        "room_type": room_type,
+        "amenities": amenities,
+        "distance": distance,
+    }
+
+
+def _popcount(masks: np.ndarray) -> np.ndarray:
+    return np.unpackbits(masks.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def _normalized(values: np.ndarray) -> np.ndarray:
+    """Scale to [0, 1] with 0 for the smallest value; missing values count as the worst."""
+    if np.all(np.isnan(values)):
+        return np.zeros_like(values)
+    low, high = np.nanmin(values), np.nanmax(values)
+    span = high - low if high > low else 1.0
+    return np.nan_to_num((values - low) / span, nan=1.0)
+
+
+def rank_stays(
+    listings: List[Dict[str, Any]],
+    preferences,
+    venue: Optional[Tuple[float, float]] = None,
+    top_k: int = TOP_K,
+) -> List[Dict[str, Any]]:
+    """Apply StayPreferences as hard filters and a weighted score, returning the top_k listings."""
+    if not listings:
+        return []
+
+    columns = encode_listings(listings, preferences.preferred_amenities, venue)
+
+    keep = np.ones(len(listings), dtype=bool)
+    if preferences.max_budget:
+        keep &= ~(columns["price"] > preferences.max_budget)
+    if preferences.ac_preference == "ac":
+        keep &= columns["ac"] != -1
+    elif preferences.ac_preference == "non-ac":
+        keep &= columns["ac"] != 1
+    if preferences.room_type == "hotel":
+        keep &= np.array([t == "" or "hotel" in t for t in columns["room_type"]])
+    elif preferences.room_type == "pg/hostel":
+        keep &= np.array([t == "" or "pg" in t or "hostel" in t for t in columns["room_type"]])
+
+    wanted = max(len(preferences.preferred_amenities[:64]), 1)
+    score = (
+        SCORE_WEIGHTS["price"] * (1.0 - _normalized(columns["price"]))
+        + SCORE_WEIGHTS["amenities"] * _popcount(columns["amenities"]) / wanted
+        + SCORE_WEIGHTS["distance"] * (1.0 - _normalized(columns["distance"]))
+    )
+    score = np.where(keep, score, -np.inf)
+
+    order = np.argsort(-score, kind="stable")[:top_k]
+    return [listings[i] for i in order if np.isfinite(score[i])]
+
+
+def _extract_listings(payload: Any) -> Optional[List[Dict[str, Any]]]:
+    if isinstance(payload, dict):
+        payload = next((payload[key] for key in LISTING_LIST_KEYS if isinstance(payload.get(key), list)), None)
+    if isinstance(payload, list) and all(isinstance(item, dict) for item in payload):
+        return payload
+    return None
+
+
+def rank_tool_result(
+    result: CallToolResult,
+    preferences,
+    venue: Optional[Tuple[float, float]] = None,
+    top_k: int = TOP_K,
+    collected: Optional[List[Dict[str, Any]]] = None,
+) -> CallToolResult:
+    """Replace a stay tool's listing payload with only the top ranked listings.
+
+    Results that are errors or don't look like a list of listings are returned unchanged.
+    The kept listings are also appended to collected, if given.
+    """
+    if result.isError or len(result.content) != 1 or not isinstance(result.content[0], TextContent):
+        return result
+
+    try:
+        listings = _extract_listings(json.loads(result.content[0].text))
+    except json.JSONDecodeError:
+        return result
+    if listings is None:
+        return result
+
+    top = rank_stays(listings, preferences, venue=venue, top_k=top_k)
+    if collected is not None:
+        collected.extend(top)
+    logging.info(f"Stay ranking kept {len(top)} of {len(listings)} listings")
+    return result.model_copy(update={"content": [TextContent(type="text", text=json.dumps(top))]})
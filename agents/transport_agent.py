@@ -1,13 +1,15 @@
 from pydantic_ai import Agent
-import mcp_client
+from config_registry import config_registry, mcp_pool
 from dataclasses import dataclass
 from typing import List, Literal
 from dotenv import load_dotenv
 from model import get_openai_model
+from agents.transport_matrix import route_cache
+from prompts import assemble_system_prompt, sorted_tools, prompt_cache_stats
 
 
 load_dotenv()
-model = get_openai_model()
+model = get_openai_model("transport")
 
 @dataclass
 class TransportPreferences:
@@ -17,11 +19,10 @@ class TransportPreferences:
     ac_preference: Literal["ac", "non-ac", "any"]
 
 
-system_prompt = f"""
+system_prompt = """
 You are a transport route and recommendation assistant that helps users plan travel to sports venues or events.
 
-Use the following tools to search for transport options and shows the user the best routes according to his preferences:
-{tool_descriptions}
+Use the tools listed below to search for transport options and show the user the best routes according to their preferences.
 
 Your responsibilities:
 - Recommend suitable transport options and best routes based on user preferences such as:
@@ -39,9 +40,12 @@ Your responsibilities:
 Give practical and concise suggestions, with clear reasoning based on user constraints.
 """
 
-config_path = "./configs/transport.json"
+config_name = "transport"
 async def get_transport_agent():
-    client = mcp_client.MCPClient()
-    client.load_servers(config_path)
-    tools = await client.start()
-    return client, Agent(model=get_openai_model(), system_prompt=system_prompt, deps_type=TransportPreferences, tools=tools)
+    if not config_registry.has(config_name):
+        raise ValueError(f"No valid MCP config named '{config_name}' in {config_registry.config_dir}")
+    client = await mcp_pool.lease(config_name, tool_cache=route_cache)
+    tools = sorted_tools(client.tools)
+    prompt = assemble_system_prompt(system_prompt, tools)
+    prompt_cache_stats.record_system_prompt("transport", prompt)
+    return client, Agent(model=get_openai_model("transport"), system_prompt=prompt, deps_type=TransportPreferences, tools=tools)
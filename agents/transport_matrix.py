@@ -0,0 +1,189 @@
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import math
+
+from mcp_client import ToolResultCache
+
+
+# Approximate coordinates (lat, lon) for cities we see most often
+KNOWN_CITIES: Dict[str, Tuple[float, float]] = {
+    "mumbai": (19.0760, 72.8777),
+    "delhi": (28.6139, 77.2090),
+    "new delhi": (28.6139, 77.2090),
+    "bengaluru": (12.9716, 77.5946),
+    "bangalore": (12.9716, 77.5946),
+    "hyderabad": (17.3850, 78.4867),
+    "chennai": (13.0827, 80.2707),
+    "kolkata": (22.5726, 88.3639),
+    "pune": (18.5204, 73.8567),
+    "ahmedabad": (23.0225, 72.5714),
+    "jaipur": (26.9124, 75.7873),
+    "lucknow": (26.8467, 80.9462),
+    "chandigarh": (30.7333, 76.7794),
+    "kochi": (9.9312, 76.2673),
+    "goa": (15.2993, 74.1240),
+    "indore": (22.7196, 75.8577),
+    "bhopal": (23.2599, 77.4126),
+    "nagpur": (21.1458, 79.0882),
+    "surat": (21.1702, 72.8311),
+    "noida": (28.5355, 77.3910),
+    "gurugram": (28.4595, 77.0266),
+    "gurgaon": (28.4595, 77.0266),
+    "mysuru": (12.2958, 76.6394),
+    "mysore": (12.2958, 76.6394),
+    "coimbatore": (11.0168, 76.9558),
+    "visakhapatnam": (17.6868, 83.2185),
+    "guwahati": (26.1445, 91.7362),
+    "dehradun": (30.3165, 78.0322),
+}
+
+EARTH_RADIUS_KM = 6371.0
+
+# Closer than this counts as the same place (aliases like bangalore/bengaluru are 0 km apart)
+LOCAL_TRIP_KM = 1.0
+
+# Straight-line distance is shorter than any real route; scale it for ground modes
+ROAD_FACTOR = 1.3
+
+# mode -> (average speed km/h, fixed overhead hours, min km, max km, has AC)
+MODE_PROFILES: Dict[str, Tuple[float, float, float, float, Optional[bool]]] = {
+    "flight": (650.0, 2.5, 400.0, math.inf, True),
+    "train": (60.0, 0.5, 30.0, 2500.0, None),
+    "bus": (45.0, 0.5, 0.0, 1000.0, None),
+    "cab": (50.0, 0.0, 0.0, 600.0, None),
+    "car": (55.0, 0.0, 0.0, 900.0, None),
+    "metro": (32.0, 0.2, 0.0, 50.0, True),
+    "bike": (35.0, 0.0, 0.0, 150.0, False),
+}
+
+# distance_preference -> maximum road distance in km
+DISTANCE_PREFERENCE_LIMITS: Dict[str, float] = {
+    "near": 50.0,
+    "moderate": 300.0,
+    "far": 1000.0,
+    "very_far": math.inf,
+}
+
+
+@dataclass
+class TransportOption:
+    mode: str
+    distance_km: float
+    duration_hours: float
+
+
+@dataclass
+class TransportPlan:
+    origin: str
+    destination: str
+    distance_km: Optional[float]
+    options: List[TransportOption] = field(default_factory=list)
+    rejected: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def is_resolved(self) -> bool:
+        """True when both cities are known, so the plan can be answered without the LLM."""
+        return self.distance_km is not None
+
+    @property
+    def is_local(self) -> bool:
+        """True when origin and destination are the same known place, so no transport is needed."""
+        return self.distance_km is not None and self.distance_km < LOCAL_TRIP_KM
+
+
+def normalize_city(name: str) -> str:
+    return " ".join(name.lower().replace(",", " ").split())
+
+
+def haversine_km(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    lat1, lon1 = map(math.radians, a)
+    lat2, lon2 = map(math.radians, b)
+    h = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+@lru_cache(maxsize=1)
+def distance_matrix() -> Dict[Tuple[str, str], float]:
+    """Precompute straight-line distances between every pair of known cities."""
+    cities = list(KNOWN_CITIES)
+    return {
+        (a, b): haversine_km(KNOWN_CITIES[a], KNOWN_CITIES[b])
+        for a in cities
+        for b in cities
+    }
+
+
+def lookup_distance_km(origin: str, destination: str) -> Optional[float]:
+    """Straight-line distance between two known cities, or None if either is unknown."""
+    return distance_matrix().get((normalize_city(origin), normalize_city(destination)))
+
+
+def plan_transport(origin: str, destination: str, preferences) -> TransportPlan:
+    """Deterministically work out which transport modes are eligible for a trip.
+
+    Applies the same rules the transport agent is prompted with (flights only above
+    400 km, max_travel_hours, preferred modes, AC preference, distance preference)
+    using the precomputed city matrix.
+    """
+    air_km = lookup_distance_km(origin, destination)
+    plan = TransportPlan(origin=origin, destination=destination, distance_km=air_km)
+    if air_km is None:
+        return plan
+
+    road_km = air_km * ROAD_FACTOR
+    max_distance = DISTANCE_PREFERENCE_LIMITS.get(preferences.distance_preference, math.inf)
+    if road_km > max_distance:
+        plan.rejected = {
+            mode: f"{road_km:.0f} km exceeds the '{preferences.distance_preference}' distance preference"
+            for mode in preferences.preferred_transport_modes
+        }
+        return plan
+
+    for mode in preferences.preferred_transport_modes:
+        profile = MODE_PROFILES.get(mode)
+        if profile is None:
+            plan.rejected[mode] = "unknown transport mode"
+            continue
+
+        speed, overhead, min_km, max_km, has_ac = profile
+        distance = air_km if mode == "flight" else road_km
+        if not min_km <= distance <= max_km:
+            plan.rejected[mode] = f"not suitable for {distance:.0f} km"
+            continue
+        if preferences.ac_preference == "ac" and has_ac is False:
+            plan.rejected[mode] = "no AC option"
+            continue
+        if preferences.ac_preference == "non-ac" and has_ac is True:
+            plan.rejected[mode] = "only AC options"
+            continue
+
+        duration = distance / speed + overhead
+        if duration > preferences.max_travel_hours:
+            plan.rejected[mode] = f"takes about {duration:.1f} h, over the {preferences.max_travel_hours} h limit"
+            continue
+
+        plan.options.append(TransportOption(mode=mode, distance_km=round(distance, 1), duration_hours=round(duration, 1)))
+
+    plan.options.sort(key=lambda option: option.duration_hours)
+    return plan
+
+
+def format_transport_plan(plan: TransportPlan) -> str:
+    """Render a resolved plan as the transport node's output."""
+    lines = [f"Transport options from {plan.origin} to {plan.destination} (~{plan.distance_km * ROAD_FACTOR:.0f} km by road):"]
+    if plan.options:
+        for option in plan.options:
+            lines.append(f"- {option.mode}: about {option.duration_hours} h over {option.distance_km:.0f} km")
+    else:
+        lines.append("- No transport mode matches your preferences.")
+    for mode, reason in plan.rejected.items():
+        lines.append(f"- {mode} not suggested: {reason}")
+    return "\n".join(lines)
+
+
+# Memoizes route/duration results from the transport MCP server across requests
+route_cache = ToolResultCache(ttl_seconds=6 * 3600)
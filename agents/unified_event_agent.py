@@ -1,12 +1,13 @@
 from pydantic_ai import Agent
-import mcp_client
+from config_registry import config_registry, mcp_pool
 from dataclasses import dataclass
 from typing import Literal, Optional, Union
 from dotenv import load_dotenv
 from model import get_openai_model
+from prompts import assemble_system_prompt, sorted_tools, prompt_cache_stats
 
 load_dotenv()
-model = get_openai_model()
+model = get_openai_model("event")
 
 # INTENT-SPECIFIC PREFERENCES
 
@@ -52,7 +53,7 @@ AllEventPreferences = Union[
 ]
 
 # SYSTEM PROMPT
-system_prompt = f"""
+system_prompt = """
 You are a smart event discovery assistant that handles multiple types of events.
 
 Supported intents:
@@ -89,8 +90,7 @@ Use the right preferences based on intent:
     - is_paid, budget_if_paid
 
 
-Use the following tools to search for events options:
-{tool_descriptions}
+Use the tools listed below to search for event options.
 
 Guidelines:
 - Always apply budget filters if the user prefers 'paid' events and gives a budget.
@@ -102,34 +102,43 @@ You’ll receive the correct preference schema dynamically.
 """
 
 
+# Config registry names (configs/<name>.json)
 INTENT_CONFIG_MAP = {
-    "book_game_event": "configs/event_game.json",
-    "book_fitness_event": "configs/event_fitness.json",
-    "book_tech_event": "configs/event_tech.json",
-    "book_general_event": "configs/event_general.json",
+    "book_game_event": "event_game",
+    "book_fitness_event": "event_fitness",
+    "book_tech_event": "event_tech",
+    "book_general_event": "event_general",
 }
 
 INTENT_PREFS_CONFIG_MAP = {
-    "book_game_event": AllEventPreferences[GameEventPreferences],
-    "book_fitness_event": AllEventPreferences[FitnessEventPreferences],
-    "book_tech_event": AllEventPreferences[TechEventPreferences],
-    "book_general_event": AllEventPreferences[GeneralEventPreferences],
+    "book_game_event": GameEventPreferences,
+    "book_fitness_event": FitnessEventPreferences,
+    "book_tech_event": TechEventPreferences,
+    "book_general_event": GeneralEventPreferences,
 }
 
+# Static part of the event search request; per-request fields are appended after it
+event_request_instructions = """
+Suggest 2-3 interesting events related to the category below, between the given dates.
+Use the location_scope preference to decide how far from the user's location to search, and the format preference to choose online or offline events.
+Each event should include title/name of event, location of event, format of event (online/offline), event_start_date, event_end_date (optional, if one-day event), and a description of the event.
+Return the response as a JSON list of events.
+"""
+
 # UNIFIED EVENT AGENT 
 
 async def get_unified_event_agent(intent:str):
-    config_path = INTENT_CONFIG_MAP.get(intent)
-    if not config_path or not Path(config_path).exists():
+    config_name = INTENT_CONFIG_MAP.get(intent)
+    if not config_name or not config_registry.has(config_name):
         raise ValueError(f"No config found for the required intent: {intent}")
     
-    client = mcp_client.MCPClient()
-    client.load_servers(config_path)
-    tools = await client.start()
+    client = await mcp_pool.lease(config_name)
+    tools = sorted_tools(client.tools)
+    prompt = assemble_system_prompt(system_prompt, tools)
+    prompt_cache_stats.record_system_prompt("event", prompt)
     return client, Agent(
-        model=get_openai_model(),
-        system_prompt=system_prompt,
+        model=get_openai_model("event"),
+        system_prompt=prompt,
         deps_type=INTENT_PREFS_CONFIG_MAP.get(intent),
-        tools=tools,
-        system_prompt=system_prompt
+        tools=tools
     )
@@ -0,0 +1,284 @@
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import json
+import logging
+import time
+
+from mcp.types import CallToolResult, TextContent
+
+
+# Named timeslots -> [start hour, end hour)
+TIMESLOT_HOURS: Dict[str, Tuple[int, int]] = {
+    "morning": (5, 12),
+    "afternoon": (12, 17),
+    "evening": (17, 21),
+    "night": (21, 24),
+    "any": (0, 24),
+}
+
+ALL_HOURS = (1 << 24) - 1
+
+VENUE_LIST_KEYS = ("venues", "results", "facilities")
+
+# Tool argument names the venue MCP servers use for the query scope
+SPORT_ARG_KEYS = ("sport", "game", "game_name", "preferred_games")
+CITY_ARG_KEYS = ("city", "location")
+DATE_ARG_KEYS = ("date", "day", "start_date")
+END_DATE_ARG_KEYS = ("end_date",)
+# Arguments that narrow the result below "every venue for the day"
+FILTER_ARG_KEYS = ("preferred_timeslot", "timeslot", "time", "slot", "start_time", "end_time", "gym_availability")
+
+
+@dataclass
+class VenueAvailability:
+    name: str
+    slots: int  # bit h set -> the hour starting at h:00 is available
+    has_gym: bool
+    details: Dict[str, Any]
+
+
+def _hour(value: str) -> int:
+    return int(value.strip().split(":")[0])
+
+
+def timeslot_mask(preferred_timeslot: Optional[str]) -> int:
+    """Bitmap of hours covered by a named timeslot ("evening") or an hour range ("18:00-21:00")."""
+    if not preferred_timeslot:
+        return ALL_HOURS
+    slot = preferred_timeslot.strip().lower()
+    if slot in TIMESLOT_HOURS:
+        start, end = TIMESLOT_HOURS[slot]
+    else:
+        try:
+            start, end = (_hour(part) for part in slot.split("-", 1))
+        except ValueError:
+            return ALL_HOURS
+    return sum(1 << hour for hour in range(start, min(end, 24)))
+
+
+def slots_to_bitmap(slots: Iterable[str]) -> int:
+    """Encode slots like "06:00-08:00" (or a bare "06:00") as an hour bitmap."""
+    bitmap = 0
+    for slot in slots:
+        try:
+            if "-" in slot:
+                start, end = (_hour(part) for part in slot.split("-", 1))
+            else:
+                start = _hour(slot)
+                end = start + 1
+        except ValueError:
+            continue
+        bitmap |= sum(1 << hour for hour in range(start, min(end, 24)))
+    return bitmap
+
+
+def date_range(start_date: str, end_date: Optional[str]) -> List[str]:
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date) if end_date else start
+    return [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+
+class VenueAvailabilityIndex:
+    """Local sport x city x date index of venue slot bitmaps, refreshed from venue tool results.
+
+    Entries expire after ttl_seconds; lookups only hit when every requested date is fresh.
+    Only complete tool results are indexed, since an entry is treated as the full list of
+    venues for its day.
+    """
+
+    def __init__(self, ttl_seconds: float = 900.0) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[Tuple[str, str, str], Tuple[float, Dict[str, VenueAvailability]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(sport: str, city: str, day: str) -> Tuple[str, str, str]:
+        return (sport.strip().lower(), city.strip().lower(), day)
+
+    def update(self, sport: str, city: str, day: str, venues: List[VenueAvailability]) -> None:
+        """Merge venues into the entry for (sport, city, day), refreshing its TTL."""
+        key = self.make_key(sport, city, day)
+        expires, current = self._entries.get(key, (0.0, {}))
+        if expires < time.monotonic():
+            current = {}
+        current.update({venue.name: venue for venue in venues})
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, current)
+
+    def invalidate(self, sport: str, city: str, day: str) -> None:
+        self._entries.pop(self.make_key(sport, city, day), None)
+
+    def lookup(
+        self,
+        sport: str,
+        city: str,
+        days: List[str],
+        preferred_timeslot: Optional[str] = None,
+        gym_availability: bool = False,
+    ) -> Optional[Dict[str, List[VenueAvailability]]]:
+        """Venues matching the timeslot (and gym requirement) per day, or None on a miss.
+
+        An empty days list (no valid date range) is always a miss.
+        """
+        matches = self.peek(sport, city, days, preferred_timeslot, gym_availability)
+        if matches is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return matches
+
+    def peek(
+        self,
+        sport: str,
+        city: str,
+        days: List[str],
+        preferred_timeslot: Optional[str] = None,
+        gym_availability: bool = False,
+    ) -> Optional[Dict[str, List[VenueAvailability]]]:
+        """Same as lookup, without counting towards the hit rate."""
+        if not days:
+            return None
+        mask = timeslot_mask(preferred_timeslot)
+        now = time.monotonic()
+        matches: Dict[str, List[VenueAvailability]] = {}
+        for day in days:
+            entry = self._entries.get(self.make_key(sport, city, day))
+            if entry is None or entry[0] < now:
+                return None
+            matches[day] = [
+                venue
+                for venue in entry[1].values()
+                if venue.slots & mask and (venue.has_gym or not gym_availability)
+            ]
+        return matches
+
+    def recorder(self, sport: str, city: str, days: List[str]) -> Callable[[CallToolResult, Dict[str, Any]], CallToolResult]:
+        """A result_transform for MCPClient that feeds venue tool results into the index.
+
+        Only calls scoped to this request's sport and city, without slot or gym filters,
+        are indexed; see call_default_day for how their dates are resolved.
+        """
+        def record(result: CallToolResult, arguments: Dict[str, Any]) -> CallToolResult:
+            try:
+                indexable, default_day = call_default_day(arguments, sport, city, days)
+                if indexable:
+                    self.record_tool_result(result, sport, city, default_day)
+            except Exception as e:
+                logging.warning(f"Could not index venue tool result: {e}")
+            return result
+
+        return record
+
+    def record_tool_result(self, result: CallToolResult, sport: str, city: str, default_day: Optional[str]) -> None:
+        """Index a complete venue result; records without a date go under default_day, if there is one."""
+        if result.isError:
+            return
+        for content in result.content:
+            if not isinstance(content, TextContent):
+                continue
+            try:
+                payload = json.loads(content.text)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(payload, dict):
+                payload = next((payload[key] for key in VENUE_LIST_KEYS if isinstance(payload.get(key), list)), [])
+            if not isinstance(payload, list):
+                continue
+
+            # A result with any venue missing its name or slots is partial; indexing the rest
+            # would make later lookups answer as if those were all the venues there are
+            if not payload or not all(
+                isinstance(record, dict)
+                and record.get("name")
+                and isinstance(record.get("available_slots", record.get("slots")), list)
+                for record in payload
+            ):
+                logging.info("Not indexing a venue tool result without slots for every venue")
+                continue
+
+            if default_day is None and not all(record.get("date") for record in payload):
+                continue
+
+            by_day: Dict[str, List[VenueAvailability]] = {}
+            for record in payload:
+                slots = record.get("available_slots", record.get("slots"))
+                venue = VenueAvailability(
+                    name=record["name"],
+                    slots=slots_to_bitmap(slots),
+                    has_gym=bool(record.get("has_gym", record.get("gym", False))),
+                    details=record,
+                )
+                by_day.setdefault(record.get("date", default_day), []).append(venue)
+
+            for day, venues in by_day.items():
+                self.update(sport, city, day, venues)
+
+
+def _argument(arguments: Dict[str, Any], keys: Tuple[str, ...]) -> Any:
+    return next((arguments[key] for key in keys if arguments.get(key) not in (None, "", [])), None)
+
+
+def call_default_day(arguments: Dict[str, Any], sport: str, city: str, days: List[str]) -> Tuple[bool, Optional[str]]:
+    """Whether a venue tool call's result can be indexed under (sport, city), and the day
+    to file records without their own date under (None if that would be a guess).
+
+    Calls for another sport or city, or narrowed by a timeslot or gym filter, return
+    only part of the venues for a day and are not indexable.
+    """
+    queried_sport = _argument(arguments, SPORT_ARG_KEYS)
+    if isinstance(queried_sport, list):
+        queried_sport = queried_sport[0] if len(queried_sport) == 1 else None
+        if queried_sport is None:
+            return False, None
+    if queried_sport is not None and str(queried_sport).strip().lower() != sport.strip().lower():
+        return False, None
+
+    queried_city = _argument(arguments, CITY_ARG_KEYS)
+    if queried_city is not None and str(queried_city).strip().lower() != city.strip().lower():
+        return False, None
+
+    for key in FILTER_ARG_KEYS:
+        value = arguments.get(key)
+        if value not in (None, "", False) and str(value).strip().lower() != "any":
+            return False, None
+
+    queried_day = _argument(arguments, DATE_ARG_KEYS)
+    if queried_day is None:
+        return True, days[0] if len(days) == 1 else None
+    queried_end = _argument(arguments, END_DATE_ARG_KEYS)
+    try:
+        queried_days = date_range(str(queried_day)[:10], str(queried_end)[:10] if queried_end else None)
+    except ValueError:
+        return False, None
+    return True, queried_days[0] if len(queried_days) == 1 else None
+
+
+def format_venue_availability(sport: str, city: str, matches: Dict[str, List[VenueAvailability]]) -> str:
+    """Render an index hit as the venue node's output."""
+    lines = [f"Available {sport} venues in {city}:"]
+    for day, venues in matches.items():
+        if not venues:
+            lines.append(f"- {day}: no venues with free slots matching your preferences")
+            continue
+        for venue in venues:
+            hours = [f"{hour:02d}:00" for hour in range(24) if venue.slots >> hour & 1]
+            address = venue.details.get("address") or venue.details.get("location")
+            where = f" ({address})" if address else ""
+            lines.append(f"- {day}: {venue.name}{where}, free slots from {', '.join(hours)}")
+    return "\n".join(lines)
+
+
+def venue_candidates(matches: Dict[str, List[VenueAvailability]], preferred_timeslot: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Flatten an index hit into plan candidates, each booked at its first free hour in the timeslot."""
+    mask = timeslot_mask(preferred_timeslot)
+    candidates = []
+    for day, venues in matches.items():
+        for venue in venues:
+            free = venue.slots & mask
+            start_hour = (free & -free).bit_length() - 1
+            candidates.append({**venue.details, "name": venue.name, "date": day, "start_hour": start_hour})
+    return candidates
+
+
+venue_index = VenueAvailabilityIndex()
@@ -0,0 +1,126 @@
+"""Microbenchmark for MCP stdio transports against a local stub server.
+
+Compares the stock stdio_client/ClientSession pair with PipelinedSession (with and
+without JSON-RPC batching) for sequential and concurrent tool calls, and prints the
+per-call overhead for small and large results.
+
+    python bench_mcp.py --calls 500 --concurrency 8
+"""
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from typing import Any, Awaitable, Callable, Dict, List
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from mcp_transport import PipelinedSession
+
+
+STUB_TOOL = {
+    "name": "echo",
+    "description": "Returns a payload of the requested size.",
+    "inputSchema": {"type": "object", "properties": {"size": {"type": "integer"}}},
+}
+
+
+def stub_response(message: Dict[str, Any]) -> Dict[str, Any] | None:
+    method = message.get("method")
+    if "id" not in message:
+        return None
+    if method == "initialize":
+        result = {
+            "protocolVersion": message["params"]["protocolVersion"],
+            "capabilities": {"tools": {}},
+            "serverInfo": {"name": "bench-stub", "version": "0.1.0"},
+        }
+    elif method == "tools/list":
+        result = {"tools": [STUB_TOOL]}
+    elif method == "tools/call":
+        size = message["params"]["arguments"].get("size", 16)
+        result = {"content": [{"type": "text", "text": "x" * size}], "isError": False}
+    elif method == "ping":
+        result = {}
+    else:
+        return {"jsonrpc": "2.0", "id": message["id"], "error": {"code": -32601, "message": "Method not found"}}
+    return {"jsonrpc": "2.0", "id": message["id"], "result": result}
+
+
+def serve_stub() -> None:
+    """Newline-delimited JSON-RPC stub MCP server on stdin/stdout; accepts batches."""
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        payload = json.loads(line)
+        if isinstance(payload, list):
+            responses = [response for response in map(stub_response, payload) if response]
+            if responses:
+                sys.stdout.write(json.dumps(responses) + "\n")
+        else:
+            response = stub_response(payload)
+            if response:
+                sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+
+
+async def timed_calls(call: Callable[[], Awaitable[Any]], calls: int, concurrency: int) -> float:
+    """Seconds per call for `calls` tool calls issued `concurrency` at a time."""
+    started = time.perf_counter()
+    issued = 0
+    while issued < calls:
+        step = min(concurrency, calls - issued)
+        await asyncio.gather(*(call() for _ in range(step)))
+        issued += step
+    return (time.perf_counter() - started) / max(calls, 1)
+
+
+async def bench_client_session(size: int, calls: int, concurrency: int) -> float:
+    params = StdioServerParameters(command=sys.executable, args=[__file__, "--serve"])
+    async with stdio_client(params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            return await timed_calls(lambda: session.call_tool("echo", {"size": size}), calls, concurrency)
+
+
+async def bench_pipelined(size: int, calls: int, concurrency: int, batch: bool) -> float:
+    session = PipelinedSession(sys.executable, [__file__, "--serve"], batch=batch)
+    await session.start()
+    try:
+        await session.initialize()
+        return await timed_calls(lambda: session.call_tool("echo", {"size": size}), calls, concurrency)
+    finally:
+        await session.close()
+
+
+async def run_benchmarks(args: argparse.Namespace) -> List[tuple[str, int, int, float]]:
+    transports = {
+        "ClientSession": lambda size, concurrency: bench_client_session(size, args.calls, concurrency),
+        "Pipelined": lambda size, concurrency: bench_pipelined(size, args.calls, concurrency, batch=False),
+        "Pipelined+batch": lambda size, concurrency: bench_pipelined(size, args.calls, concurrency, batch=True),
+    }
+    results = []
+    for size in args.sizes:
+        for concurrency in (1, args.concurrency):
+            for name, bench in transports.items():
+                results.append((name, size, concurrency, await bench(size, concurrency)))
+    return results
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark MCP stdio transports against a stub server.")
+    parser.add_argument("--serve", action="store_true", help="Run as the stub MCP server.")
+    parser.add_argument("--calls", type=int, default=400, help="Tool calls per measurement.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent calls per step for the concurrent runs.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 256 * 1024], help="Result payload sizes in bytes.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.serve:
+        serve_stub()
+    else:
+        print(f"{'transport':<16} {'payload':>9} {'concurrency':>11} {'us/call':>9}")
+        for name, size, concurrency, seconds in asyncio.run(run_benchmarks(args)):
+            print(f"{name:<16} {size:>9} {concurrency:>11} {seconds * 1e6:>9.1f}")
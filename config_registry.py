@@ -0,0 +1,279 @@
+from dataclasses import fields
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import json
+import logging
+import os
+
+import mcp_client
+from resilience import ResiliencePolicy
+
+
+CONFIG_DIR = Path(__file__).parent / "configs"
+
+TRANSPORTS = ("stdio", "pipelined")
+
+
+def validate_config(name: str, config: Any) -> Dict[str, Any]:
+    """Check an MCP config ({"mcpServers": {...}}) and return it, raising ValueError if it is malformed."""
+    if not isinstance(config, dict) or not isinstance(config.get("mcpServers"), dict):
+        raise ValueError(f"Config '{name}' must be an object with an 'mcpServers' mapping")
+
+    policy_fields = {f.name for f in fields(ResiliencePolicy)}
+    for server_name, server in config["mcpServers"].items():
+        where = f"Config '{name}', server '{server_name}'"
+        if not isinstance(server, dict):
+            raise ValueError(f"{where}: must be an object")
+        if not isinstance(server.get("command"), str) or not server["command"]:
+            raise ValueError(f"{where}: 'command' must be a non-empty string")
+        if not isinstance(server.get("args"), list) or not all(isinstance(arg, str) for arg in server["args"]):
+            raise ValueError(f"{where}: 'args' must be a list of strings")
+        env = server.get("env")
+        if env is not None and not (isinstance(env, dict) and all(isinstance(value, str) for value in env.values())):
+            raise ValueError(f"{where}: 'env' must map names to strings")
+        if server.get("transport", "stdio") not in TRANSPORTS:
+            raise ValueError(f"{where}: 'transport' must be one of {', '.join(TRANSPORTS)}")
+        if not isinstance(server.get("batch", False), bool):
+            raise ValueError(f"{where}: 'batch' must be true or false")
+        resilience = server.get("resilience", {})
+        if not isinstance(resilience, dict):
+            raise ValueError(f"{where}: 'resilience' must be an object")
+        unknown = set(resilience) - policy_fields
+        if unknown:
+            raise ValueError(f"{where}: unknown resilience settings {sorted(unknown)}")
+        try:
+            ResiliencePolicy(**resilience)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{where}: invalid resilience settings: {e}") from None
+    return config
+
+
+class ConfigRegistry:
+    """Parses and validates every MCP server config in configs/ once, keyed by file stem.
+
+    The directory is polled in the background for changes; each successful reload bumps
+    the config's version and notifies listeners (the client pool). Invalid files are
+    logged and the last valid version, if any, is kept.
+    """
+
+    def __init__(self, config_dir: Path = CONFIG_DIR) -> None:
+        self.config_dir = config_dir
+        self._configs: Dict[str, Dict[str, Any]] = {}
+        self._versions: Dict[str, int] = {}
+        self._mtimes: Dict[str, float] = {}
+        self._listeners: List[Callable[[str], None]] = []
+        self._watch_task: Optional[asyncio.Task] = None
+        self._apply(self._scan())
+
+    def get(self, name: str) -> Dict[str, Any]:
+        try:
+            return self._configs[name]
+        except KeyError:
+            raise KeyError(f"No valid MCP config named '{name}' in {self.config_dir}") from None
+
+    def has(self, name: str) -> bool:
+        return name in self._configs
+
+    def version(self, name: str) -> int:
+        self.get(name)
+        return self._versions[name]
+
+    def names(self) -> List[str]:
+        return sorted(self._configs)
+
+    def register(self, name: str, config: Dict[str, Any]) -> None:
+        """Add or replace a config programmatically (not backed by a file)."""
+        self._configs[name] = validate_config(name, config)
+        self._versions[name] = self._versions.get(name, 0) + 1
+        self._notify([name])
+
+    def on_change(self, listener: Callable[[str], None]) -> None:
+        self._listeners.append(listener)
+
+    def ensure_watching(self, interval: float = 2.0) -> None:
+        """Start polling the config directory, once per event loop, on the running loop."""
+        loop = asyncio.get_running_loop()
+        if self._watch_task is None or self._watch_task.done() or self._watch_task.get_loop() is not loop:
+            self._watch_task = loop.create_task(self._watch(interval))
+
+    async def _watch(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Disk I/O happens off the event loop; results are applied on it
+                self._apply(await asyncio.to_thread(self._scan))
+            except Exception as e:
+                logging.error(f"Failed to reload MCP configs: {e}")
+
+    def _scan(self) -> Dict[str, Optional[tuple[float, Optional[Dict[str, Any]]]]]:
+        """Read files whose mtime changed; None marks a removed file, a None config an invalid one."""
+        updates: Dict[str, Optional[tuple[float, Optional[Dict[str, Any]]]]] = {}
+        seen = set()
+        for path in sorted(self.config_dir.glob("*.json")):
+            name = path.stem
+            seen.add(name)
+            mtime = os.stat(path).st_mtime
+            if self._mtimes.get(name) == mtime:
+                continue
+            try:
+                with open(path, "r") as config_file:
+                    config = validate_config(name, json.load(config_file))
+            except (ValueError, OSError) as e:
+                logging.warning(f"Ignoring MCP config {path}: {e}")
+                config = None
+            updates[name] = (mtime, config)
+        for name in set(self._mtimes) - seen:
+            updates[name] = None
+        return updates
+
+    def _apply(self, updates: Dict[str, Optional[tuple[float, Optional[Dict[str, Any]]]]]) -> None:
+        changed = []
+        for name, update in updates.items():
+            if update is None:
+                self._mtimes.pop(name, None)
+                if self._configs.pop(name, None) is not None:
+                    self._versions[name] += 1
+                    changed.append(name)
+                continue
+            mtime, config = update
+            self._mtimes[name] = mtime
+            if config is not None and config != self._configs.get(name):
+                self._configs[name] = config
+                self._versions[name] = self._versions.get(name, 0) + 1
+                changed.append(name)
+        self._notify(changed)
+
+    def _notify(self, names: List[str]) -> None:
+        for name in names:
+            for listener in self._listeners:
+                listener(name)
+
+
+class _PoolEntry:
+    """One running MCPClient for one config version, owned by a dedicated task.
+
+    The client is started and cleaned up in the same task (the stdio transport requires it)
+    and stays up until it is retired and its last lease is released.
+    """
+
+    def __init__(self, name: str, version: int, config: Dict[str, Any], tool_cache: Any) -> None:
+        self.name = name
+        self.version = version
+        self.client = mcp_client.MCPClient(tool_cache=tool_cache)
+        self.client.load_config(config)
+        self.in_use = 0
+        self.retired = False
+        self.failed = False
+        self.ready = asyncio.Event()
+        self.closing = asyncio.Event()
+        self.task = asyncio.create_task(self._run())
+
+    @property
+    def stale(self) -> bool:
+        """The owner task has finished (its loop shut down, or it died), so the client is already closed."""
+        return self.task.done() or self.task.get_loop() is not asyncio.get_running_loop()
+
+    async def _run(self) -> None:
+        try:
+            tools = await self.client.start()
+            self.failed = not tools and bool(self.client.servers)
+            self.ready.set()
+            await self.closing.wait()
+        finally:
+            await self.client.cleanup()
+            self.ready.set()
+
+    def retire(self) -> None:
+        self.retired = True
+        if self.in_use == 0:
+            self.closing.set()
+
+    def release(self) -> None:
+        self.in_use -= 1
+        if self.retired and self.in_use == 0:
+            self.closing.set()
+
+
+class ClientLease:
+    """A request's handle on a pooled client; cleanup() releases it instead of closing the servers."""
+
+    def __init__(self, entry: _PoolEntry, tools: List[Any]) -> None:
+        self.name = entry.name
+        self.tools = tools
+        self._entry: Optional[_PoolEntry] = entry
+
+    async def cleanup(self) -> None:
+        if self._entry is not None:
+            self._entry.release()
+            self._entry = None
+
+
+class MCPClientPool:
+    """Keeps one running MCPClient per config and hands out leases to requests.
+
+    When a config changes, new leases go to a client started from the new version; the
+    old client keeps serving in-flight runs and is closed once their leases are released.
+    Entries and locks belong to the event loop that created them; leasing from a new loop
+    (e.g. a second asyncio.run) starts fresh clients.
+    """
+
+    def __init__(self, registry: ConfigRegistry) -> None:
+        self.registry = registry
+        self._entries: Dict[str, _PoolEntry] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        registry.on_change(self.retire)
+
+    async def lease(self, name: str, result_transform: Optional[mcp_client.ResultTransform] = None, tool_cache: Any = None) -> ClientLease:
+        """Lease the pooled client for config name; tools apply result_transform for this lease only.
+
+        tool_cache is only used when a new client has to be started.
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Whatever the previous loop owned was closed with it (or can't be awaited from here)
+            self._loop = loop
+            self._entries.clear()
+            self._locks.clear()
+        self.registry.ensure_watching()
+        async with self._locks.setdefault(name, asyncio.Lock()):
+            version = self.registry.version(name)
+            entry = self._entries.get(name)
+            if entry is None or entry.version != version or entry.failed or entry.stale:
+                if entry is not None and not entry.stale:
+                    entry.retire()
+                entry = _PoolEntry(name, version, self.registry.get(name), tool_cache)
+                self._entries[name] = entry
+            entry.in_use += 1
+
+        try:
+            await entry.ready.wait()
+        except BaseException:
+            entry.release()
+            raise
+        if entry.failed:
+            if self._entries.get(name) is entry:
+                # Let the next lease retry with a fresh client
+                del self._entries[name]
+                entry.retire()
+            # Like a failed MCPClient.start(): the agent runs without tools
+            return ClientLease(entry, [])
+        return ClientLease(entry, entry.client.tools_for(result_transform))
+
+    def retire(self, name: str) -> None:
+        entry = self._entries.pop(name, None)
+        if entry is not None:
+            logging.info(f"MCP config '{name}' changed; retiring its pooled client")
+            entry.retire()
+
+    async def close(self) -> None:
+        entries = list(self._entries.values())
+        self._entries.clear()
+        for entry in entries:
+            entry.retire()
+        await asyncio.gather(*(entry.task for entry in entries), return_exceptions=True)
+
+
+config_registry = ConfigRegistry()
+mcp_pool = MCPClientPool(config_registry)
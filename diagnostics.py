@@ -0,0 +1,296 @@
+"""Memory diagnostics for long-running graph workers.
+
+Enable with DIAGNOSTICS=1. A background thread periodically snapshots tracemalloc's top
+allocators, counts live MCPServer/ClientSession objects and child processes, and measures
+checkpoint store size per thread; each report also carries per-agent prompt cache usage
+and per-caller resilience metrics. The latest report is served as JSON on
+http://127.0.0.1:$DIAGNOSTICS_PORT/diagnostics, and threshold breaches trigger the
+registered callbacks (logging by default) and set "recycle_recommended" until a report
+is back under every threshold. Start it from the worker's entry point (graph.start_diagnostics),
+not on import.
+"""
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import weakref
+
+from prompts import prompt_cache_stats
+from resilience import metrics_report
+
+
+@dataclass
+class DiagnosticsThresholds:
+    max_rss_mb: float = 2048.0
+    max_live_sessions: int = 200
+    max_child_processes: int = 200
+    max_checkpoint_mb: float = 512.0
+
+
+# Live objects by kind; entries disappear when the object is garbage collected
+_tracked: Dict[str, "weakref.WeakSet[Any]"] = {}
+_tracked_lock = threading.Lock()
+
+
+def track(kind: str, obj: Any) -> None:
+    """Register obj so diagnostics can count how many objects of this kind are still alive."""
+    with _tracked_lock:
+        _tracked.setdefault(kind, weakref.WeakSet()).add(obj)
+
+
+def live_object_counts() -> Dict[str, int]:
+    with _tracked_lock:
+        return {kind: len(objects) for kind, objects in _tracked.items()}
+
+
+def rss_mb() -> float:
+    """Current resident set size in MB (peak RSS where /proc isn't available)."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    # ru_maxrss is in bytes on macOS and in KB elsewhere
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def count_child_processes() -> int:
+    """Number of live child processes of this process (Linux /proc only, else 0)."""
+    pid = str(os.getpid())
+    count = 0
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return 0
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat_file:
+                # Field 4 is the parent pid; the command name (field 2) may contain spaces
+                if stat_file.read().rsplit(")", 1)[1].split()[1] == pid:
+                    count += 1
+        except (OSError, IndexError):
+            continue
+    return count
+
+
+def _serialized_bytes(value: Any) -> int:
+    """Bytes held in the (type, bytes) pairs nested anywhere inside a saved checkpoint value."""
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(_serialized_bytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(_serialized_bytes(item) for item in value.values())
+    return 0
+
+
+def checkpoint_sizes(checkpointer: Any) -> Dict[str, Dict[str, int]]:
+    """Checkpoint count and serialized bytes per thread held by an in-memory checkpointer.
+
+    Bytes cover the checkpoints themselves plus the channel blobs and pending writes
+    MemorySaver keeps beside them (keyed by thread_id first).
+    """
+    sizes: Dict[str, Dict[str, int]] = {}
+
+    def thread(thread_id: Any) -> Dict[str, int]:
+        return sizes.setdefault(str(thread_id), {"checkpoints": 0, "bytes": 0})
+
+    for thread_id, namespaces in list(getattr(checkpointer, "storage", {}).items()):
+        entry = thread(thread_id)
+        for checkpoints in list(namespaces.values()):
+            for saved in list(checkpoints.values()):
+                entry["checkpoints"] += 1
+                entry["bytes"] += _serialized_bytes(saved)
+    for attribute in ("blobs", "writes"):
+        for key, value in list(getattr(checkpointer, attribute, {}).items()):
+            thread(key[0])["bytes"] += _serialized_bytes(value)
+    return sizes
+
+
+class Diagnostics:
+    """Collects periodic memory reports and checks them against thresholds."""
+
+    def __init__(
+        self,
+        checkpointer: Any = None,
+        interval: float = 60.0,
+        top_allocators: int = 15,
+        thresholds: Optional[DiagnosticsThresholds] = None,
+    ) -> None:
+        self.checkpointer = checkpointer
+        self.interval = interval
+        self.top_allocators = top_allocators
+        self.thresholds = thresholds or DiagnosticsThresholds()
+        self.latest: Dict[str, Any] = {}
+        self.recycle_recommended = False
+        self._callbacks: List[Callable[[List[str], Dict[str, Any]], None]] = [self._log_breaches]
+        self._previous_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def on_breach(self, callback: Callable[[List[str], Dict[str, Any]], None]) -> None:
+        """Register callback(breaches, report), called whenever a report exceeds a threshold."""
+        self._callbacks.append(callback)
+
+    def collect(self) -> Dict[str, Any]:
+        report: Dict[str, Any] = {
+            "timestamp": time.time(),
+            "rss_mb": round(rss_mb(), 1),
+            "live_objects": live_object_counts(),
+            "child_processes": count_child_processes(),
+        }
+
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ))
+            if self._previous_snapshot is not None:
+                stats = snapshot.compare_to(self._previous_snapshot, "lineno")
+            else:
+                stats = snapshot.statistics("lineno")
+            report["top_allocators"] = [
+                {
+                    "location": str(stat.traceback[0]),
+                    "size_kb": round(stat.size / 1024, 1),
+                    "growth_kb": round(getattr(stat, "size_diff", 0) / 1024, 1),
+                    "count": stat.count,
+                }
+                for stat in stats[:self.top_allocators]
+            ]
+            self._previous_snapshot = snapshot
+
+        if self.checkpointer is not None:
+            for _ in range(3):
+                try:
+                    threads = checkpoint_sizes(self.checkpointer)
+                    break
+                except RuntimeError:
+                    # Storage changed while iterating; the graph is still writing
+                    continue
+            else:
+                threads = {}
+            report["checkpoints"] = {
+                "threads": len(threads),
+                "total_bytes": sum(thread["bytes"] for thread in threads.values()),
+                "largest_threads": dict(sorted(threads.items(), key=lambda item: item[1]["bytes"], reverse=True)[:10]),
+            }
+
+        report["prompt_cache"] = prompt_cache_stats.report()
+        report["resilience"] = metrics_report()
+
+        breaches = self.check_thresholds(report)
+        report["breaches"] = breaches
+        # Reflects the latest report, so it clears once usage drops back under the thresholds
+        report["recycle_recommended"] = self.recycle_recommended = bool(breaches)
+        self.latest = report
+        if breaches:
+            for callback in self._callbacks:
+                try:
+                    callback(breaches, report)
+                except Exception as e:
+                    logging.error(f"Diagnostics breach callback failed: {e}")
+        return report
+
+    def check_thresholds(self, report: Dict[str, Any]) -> List[str]:
+        limits = self.thresholds
+        breaches = []
+        if report["rss_mb"] > limits.max_rss_mb:
+            breaches.append(f"RSS {report['rss_mb']} MB exceeds {limits.max_rss_mb} MB")
+        sessions = report["live_objects"].get("ClientSession", 0)
+        if sessions > limits.max_live_sessions:
+            breaches.append(f"{sessions} live MCP sessions exceed {limits.max_live_sessions}")
+        if report["child_processes"] > limits.max_child_processes:
+            breaches.append(f"{report['child_processes']} child processes exceed {limits.max_child_processes}")
+        checkpoint_mb = report.get("checkpoints", {}).get("total_bytes", 0) / (1024 * 1024)
+        if checkpoint_mb > limits.max_checkpoint_mb:
+            breaches.append(f"Checkpoint store {checkpoint_mb:.1f} MB exceeds {limits.max_checkpoint_mb} MB")
+        return breaches
+
+    @staticmethod
+    def _log_breaches(breaches: List[str], report: Dict[str, Any]) -> None:
+        for breach in breaches:
+            logging.warning(f"Diagnostics threshold exceeded: {breach}")
+
+    def start(self, port: Optional[int] = None) -> None:
+        """Start periodic collection (and the inspection endpoint if a port is given)."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="diagnostics", daemon=True)
+        self._thread.start()
+        if port is not None:
+            self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+            threading.Thread(target=self._server.serve_forever, name="diagnostics-http", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+        tracemalloc.stop()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.collect()
+            except Exception as e:
+                logging.error(f"Diagnostics collection failed: {e}")
+            self._stop.wait(self.interval)
+
+    def _handler(self) -> type:
+        diagnostics = self
+
+        class DiagnosticsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.rstrip("/") == "/diagnostics/refresh":
+                    body = diagnostics.collect()
+                elif self.path.rstrip("/") in ("", "/diagnostics"):
+                    body = diagnostics.latest
+                elif self.path.rstrip("/") == "/diagnostics/thresholds":
+                    body = asdict(diagnostics.thresholds)
+                else:
+                    self.send_error(404)
+                    return
+                payload = json.dumps(body, default=str).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return DiagnosticsHandler
+
+
+def start_diagnostics_from_env(checkpointer: Any = None) -> Optional[Diagnostics]:
+    """Start diagnostics if DIAGNOSTICS=1, configured from DIAGNOSTICS_* environment variables."""
+    if os.getenv("DIAGNOSTICS", "0") != "1":
+        return None
+    thresholds = DiagnosticsThresholds(
+        max_rss_mb=float(os.getenv("DIAGNOSTICS_MAX_RSS_MB", DiagnosticsThresholds.max_rss_mb)),
+        max_live_sessions=int(os.getenv("DIAGNOSTICS_MAX_LIVE_SESSIONS", DiagnosticsThresholds.max_live_sessions)),
+        max_child_processes=int(os.getenv("DIAGNOSTICS_MAX_CHILD_PROCESSES", DiagnosticsThresholds.max_child_processes)),
+        max_checkpoint_mb=float(os.getenv("DIAGNOSTICS_MAX_CHECKPOINT_MB", DiagnosticsThresholds.max_checkpoint_mb)),
+    )
+    diagnostics = Diagnostics(
+        checkpointer=checkpointer,
+        interval=float(os.getenv("DIAGNOSTICS_INTERVAL_SECONDS", "60")),
+        thresholds=thresholds,
+    )
+    diagnostics.start(port=int(os.getenv("DIAGNOSTICS_PORT", "9464")))
+    return diagnostics
@@ -4,21 +4,33 @@ from langgraph.config import get_stream_writer
 from langgraph.types import interrupt
 from typing import Annotated, Dict, List, Any, Literal, Optional
 from typing_extensions import TypedDict
-from pydantic import ValidationError
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, fields
 import logfire
 import asyncio
+import json
+import logging
 import os
 import sys
 
 from agents.information_agent import get_userinfo_agent, UserInfo
-from agents.sports_venue_agent import get_venue_agent, VenuePreferences
-from agents.transport_agent import get_transport_agent, TransportPreferences
-from agents.stay_agent import get_stay_agent, StayPreferences
-from agents.unified_event_agent import get_unified_event_agent, AllEventPreferences
-from agents.final_agent import get_final_agent
+from agents.sports_venue_agent import get_venue_agent as build_venue_agent, VenuePreferences
+from agents.transport_agent import get_transport_agent as build_transport_agent, TransportPreferences
+from agents.venue_index import venue_index, date_range, format_venue_availability, venue_candidates
+from agents.transport_matrix import plan_transport, format_transport_plan, KNOWN_CITIES, normalize_city
+from agents.stay_agent import get_stay_agent as build_stay_agent, StayPreferences
+from agents.unified_event_agent import (
+    get_unified_event_agent as build_unified_event_agent,
+    AllEventPreferences,
+    INTENT_PREFS_CONFIG_MAP,
+    event_request_instructions,
+)
+from agents.final_agent import get_final_agent as final_agent, get_plan_summary_agent as plan_summary_agent
+from agents.plan_assembly import assemble_plans, parse_candidates, render_plans, skeleton_summary
+from streaming import StreamedFieldDecoder, AdaptiveDebouncer
+from prompts import assemble_user_prompt, prompt_cache_stats
+from diagnostics import Diagnostics, start_diagnostics_from_env
 
-from pydantic_ai.message import ModelMessage, ModelMessagesTypeAdapter
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter
 
 
 class State(TypedDict):
@@ -74,6 +86,16 @@ class State(TypedDict):
     location_scope: Literal["same_city", "inter_city", "any"]
     is_paid: Literal["free", "paid", "any"]
     budget_if_paid: Optional[float] = None
+
+    # Branch outputs, plus the structured candidates the final plan assembly combines
+    venue_output: Any
+    event_output: Any
+    stay_output: Any
+    transport_output: Any
+    final_output: str
+    activity_candidates: List[Dict[str, Any]]
+    stay_candidates: List[Dict[str, Any]]
+    transport_candidates: List[Dict[str, Any]]
     
     
 async def collect_user_info(state: State, writer) -> Dict[str, Any]:
@@ -87,25 +109,26 @@ async def collect_user_info(state: State, writer) -> Dict[str, Any]:
     
     # Call the info gathering agent
     # result = await info_gathering_agent.run(user_input)
+    # Only the response field is decoded while streaming; the full UserInfo is validated once at the end
     async with get_userinfo_agent.run_stream(user_input, message_history=message_history) as result:
-        curr_response = ""
-        async for message, last in result.stream_structured(debounce_by=0.01):  
-            try:
-                if last and not user_details.response:
-                    raise Exception("Incorrect travel details returned by the agent.")
-                user_details = await result.validate_structured_result(  
-                    message,
-                    allow_partial=not last
-                )
-            except ValidationError as e:
-                continue
-
-            if user_details.response:
-                writer(user_details.response[len(curr_response):])
-                curr_response = user_details.response  
+        response_field = StreamedFieldDecoder("response")
+        debouncer = AdaptiveDebouncer()
+        pending = ""
+        async for message, last in result.stream_structured(debounce_by=None):
+            delta = response_field.feed(message)
+            pending += delta
+            if pending and (debouncer.ready(len(delta)) or last):
+                writer(pending)
+                pending = ""
+
+        if pending:
+            writer(pending)
+        if not response_field.value:
+            raise Exception("Incorrect travel details returned by the agent.")
 
     # Return the response asking for more details if necessary
     data = await result.get_data()
+    prompt_cache_stats.record_usage("userinfo", result.usage())
     return {
         "user_details": data.model_dump(),
         "messages": [result.new_messages_json()]
@@ -139,15 +162,68 @@ async def get_venue_agent(state: State, writer) -> Dict[str, Any]:
     intent = user_details["intent"]
     location = user_details["location"]
     start_date = user_details["user_date_first"]
-    end_date = user_details["user_date_last"]:Optional[str]
+    end_date: Optional[str] = user_details.get("user_date_last")
     game_name = user_details["game_name"]
     
-    prompt = f"I need venue recommendations for {game_name} for the location '{location}' from {start_date} to {end_date}"
+    venue_dependencies = VenuePreferences(
+        preferred_games=state.get("preferred_games", [game_name]),
+        preferred_timeslot=state.get("preferred_timeslot", "any"),
+        gym_availability=state.get("gym_availability", False),
+        location_scope=state.get("location_scope", "any"),
+    )
+
+    # Check the local availability index first; only misses go to the agent and MCP tools
+    try:
+        days = date_range(start_date, end_date)
+    except (TypeError, ValueError):
+        days = []  # Unparseable dates always miss and go to the agent
+    matches = venue_index.lookup(
+        game_name,
+        location,
+        days,
+        preferred_timeslot=venue_dependencies.preferred_timeslot,
+        gym_availability=venue_dependencies.gym_availability,
+    )
+    if matches is not None:
+        return {
+            "venue_output": format_venue_availability(game_name, location, matches),
+            "activity_candidates": venue_candidates(matches, venue_dependencies.preferred_timeslot),
+        }
+
+    prompt = assemble_user_prompt(
+        "I need venue recommendations for the game below, at the given location and dates.",
+        {"game": game_name, "location": location, "start_date": start_date, "end_date": end_date or start_date},
+        deps=venue_dependencies,
+    )
     
-    # Call the venue agent
-    output = await get_venue_agent.run(prompt, deps=venue_dependencies)
+    # Call the venue agent, indexing whatever availability its tools return
+    try:
+        client, agent = await build_venue_agent(result_transform=venue_index.recorder(game_name, location, days))
+    except (KeyError, ValueError) as e:
+        # No usable MCP config (missing, or removed by a reload)
+        logging.error(f"Venue search unavailable: {e}")
+        writer("Venue search is unavailable right now.\n")
+        return {"venue_output": "Venue search is currently unavailable.", "activity_candidates": []}
+    try:
+        output = await agent.run(prompt, deps=venue_dependencies)
+    finally:
+        # Releases the pooled MCP client lease
+        await client.cleanup()
+    prompt_cache_stats.record_usage("venue", output.usage())
+
+    # The run just refreshed the index, so structured candidates are usually available now
+    matches = venue_index.peek(
+        game_name,
+        location,
+        days,
+        preferred_timeslot=venue_dependencies.preferred_timeslot,
+        gym_availability=venue_dependencies.gym_availability,
+    )
     
-    return {"venue_output": output.data}
+    return {
+        "venue_output": output.data,
+        "activity_candidates": venue_candidates(matches, venue_dependencies.preferred_timeslot) if matches else [],
+    }
 
 async def get_unified_event_agent(state: State, writer) -> Dict[str, Any]:
     writer("\n Searching for events based on your interests...\n")
@@ -155,8 +231,7 @@ async def get_unified_event_agent(state: State, writer) -> Dict[str, Any]:
     intent = user_details["intent"]
     location = user_details["location"]
     start_date = user_details["user_date_first"]
-    end_date = user_details["user_date_last"]:Optional[str]
-    location_scope = event_dependencies["location_scope"]
+    end_date: Optional[str] = user_details.get("user_date_last")
     
     # intent-specific query building
     if intent == "book_game_event":
@@ -168,17 +243,29 @@ async def get_unified_event_agent(state: State, writer) -> Dict[str, Any]:
     else:
         event_name = user_details["event_name"]
         category = event_name
-        
-    prompt = (
-        " Suggest 2-3 interesting events related to {category} between these dates: {start_date} and {end_date}."
-        " Location of user is {location}. Use the location_scope:({location_scope}) to find the events"
-        " Check in {event_dependencies} whether the user prefers online or offline events."
-        " Each event should include title/name of event, location of event, format of event (online/offline), event_start_date, event_end_date(Optional, if one-day event), and a description of the event."
-        " Return the response as JSON list of events."
+
+    event_dependencies = build_event_preferences(intent, state, category)
+
+    # Static instructions first, per-request details and preferences last (keeps the prompt prefix cacheable)
+    prompt = assemble_user_prompt(
+        event_request_instructions,
+        {"category": category, "start_date": start_date, "end_date": end_date or start_date, "location": location},
+        deps=event_dependencies,
     )
     
     # Call/ Run the unified event agent
-    output = await get_unified_event_agent.run(prompt, deps=event_dependencies)
+    try:
+        client, agent = await build_unified_event_agent(intent)
+    except (KeyError, ValueError) as e:
+        logging.error(f"Event search unavailable: {e}")
+        writer("Event search is unavailable right now.\n")
+        return {"event_output": "Event search is currently unavailable.", "activity_candidates": []}
+    try:
+        output = await agent.run(prompt, deps=event_dependencies)
+    finally:
+        # Releases the pooled MCP client lease
+        await client.cleanup()
+    prompt_cache_stats.record_usage("event", output.usage())
     
     # Example output.data expected:
     # [
@@ -192,13 +279,28 @@ async def get_unified_event_agent(state: State, writer) -> Dict[str, Any]:
     #    },
     #    ...
     # ]
-    return {"event_output": output.data}
+    return {"event_output": output.data, "activity_candidates": parse_candidates(output.data)}
 
+def build_event_preferences(intent: str, state: State, category: str) -> AllEventPreferences:
+    """Build the intent-specific event preferences from the graph state, falling back to defaults."""
+    preferences_type = INTENT_PREFS_CONFIG_MAP[intent]
+    defaults = {
+        "format": "offline",
+        "event_type": "any",
+        "location_scope": "any",
+        "competitive_level": "any",
+        "is_paid": "any",
+        "budget_if_paid": None,
+        "fitness_type": category,
+        "topic": category,
+        "interest_area": category,
+    }
+    return preferences_type(**{f.name: state.get(f.name, defaults[f.name]) for f in fields(preferences_type)})
         
 def route_to_all(state: State):
     return ["get_stay_agent", "get_transport_agent"]
  
-async def get_stay_agent(state: State):
+async def get_stay_agent(state: State, writer):
     
     writer("\n Evaluating if stay suggestions are needed...\n")
     
@@ -211,24 +313,47 @@ async def get_stay_agent(state: State):
     # Skip stay recommendation if event is online or single-day
     if is_online or not end_date or start_date == end_date:
         writer("Event is online or single-day. Skipping stay suggestions.\n")
-        return {"stay_output": "No stay needed"}
+        return {"stay_output": "No stay needed", "stay_candidates": []}
 
     writer("\n Searching for stay options...\n")
 
-    # Get the agent and tools
-    #client, agent = await get_stay_agent()
+    stay_preferences = StayPreferences(
+        room_type=state.get("room_type", "any"),
+        ac_preference=state.get("ac_preference", "any"),
+        preferred_amenities=state.get("preferred_amenities", []),
+        max_budget=state.get("max_budget", 0),
+    )
+
+    # Get the agent and tools; stay listings are pre-ranked before reaching the model
+    venue = KNOWN_CITIES.get(normalize_city(location))
+    ranked_listings: List[dict] = []
+    try:
+        client, agent = await build_stay_agent(stay_preferences, venue=venue, ranked_listings=ranked_listings)
+    except (KeyError, ValueError) as e:
+        logging.error(f"Stay search unavailable: {e}")
+        writer("Stay search is unavailable right now.\n")
+        return {"stay_output": "Stay search is currently unavailable.", "stay_candidates": []}
 
     # prompt the llm
-    prompt = f"Suggest good stay options in/near {location} for event dates {start_date} to {end_date}"
+    prompt = assemble_user_prompt(
+        "Suggest good stay options in/near the location below for the event dates.",
+        {"location": location, "start_date": start_date, "end_date": end_date},
+        deps=stay_preferences,
+    )
 
     # Run agent
-    output = await get_stay_agent.run(prompt, deps=StayPreferences)
+    try:
+        output = await agent.run(prompt, deps=stay_preferences)
+    finally:
+        # Releases the pooled MCP client lease
+        await client.cleanup()
+    prompt_cache_stats.record_usage("stay", output.usage())
 
-    return {"stay_output": output.data}
+    return {"stay_output": output.data, "stay_candidates": ranked_listings}
     
     
 
-async def get_transport_agent(state: State):
+async def get_transport_agent(state: State, writer):
     writer("\n Evaluating if transport suggestions are needed...\n")
     
     user_details = state["user_details"]
@@ -238,36 +363,104 @@ async def get_transport_agent(state: State):
     start_date = user_details["user_date_first"]
 
     # Skip transport if event is online or no origin is given
-    if is_online or not origin or origin.lower() == location.lower():
+    if is_online or not origin or normalize_city(origin) == normalize_city(location):
         writer("Event is online or user is local. Skipping transport suggestions.\n")
-        return {"transport_output": "No transport needed"}
+        return {"transport_output": "No transport needed", "transport_candidates": []}
+
+    transport_preferences = TransportPreferences(
+        max_travel_hours=state.get("max_travel_hours", 24),
+        distance_preference=state.get("distance_preference", "very_far"),
+        preferred_transport_modes=state.get("preferred_transport_modes", ["flight", "train", "bus", "car"]),
+        ac_preference=state.get("ac_preference", "any"),
+    )
+
+    # Both cities are in the local matrix: mode eligibility is deterministic, skip the LLM
+    plan = plan_transport(origin, location, transport_preferences)
+    if plan.is_local:
+        # Different names for the same city (e.g. bangalore / bengaluru)
+        writer("Event is online or user is local. Skipping transport suggestions.\n")
+        return {"transport_output": "No transport needed", "transport_candidates": []}
 
     writer("\n Searching for transport options...\n")
+    if plan.is_resolved:
+        return {
+            "transport_output": format_transport_plan(plan),
+            "transport_candidates": [asdict(option) for option in plan.options],
+        }
 
     # Get the agent and tools
-    client, agent = await get_transport_agent()
+    try:
+        client, agent = await build_transport_agent()
+    except (KeyError, ValueError) as e:
+        logging.error(f"Transport search unavailable: {e}")
+        writer("Transport search is unavailable right now.\n")
+        return {"transport_output": "Transport search is currently unavailable.", "transport_candidates": []}
 
     # Prompt for LLM
-    prompt = f"Suggest transport options from {origin} to {location} for arrival by {start_date}"
+    prompt = assemble_user_prompt(
+        "Suggest transport options for the trip below, arriving by the given date.",
+        {"origin": origin, "destination": location, "arrive_by": start_date},
+        deps=transport_preferences,
+    )
 
     # Run agent with appropriate schema
-    output = await agent.run(prompt, deps=TransportPreferences)
+    try:
+        output = await agent.run(prompt, deps=transport_preferences)
+    finally:
+        # Releases the pooled MCP client lease
+        await client.cleanup()
+    prompt_cache_stats.record_usage("transport", output.usage())
 
-    return {"transport_output": output.data}
+    # Free-text options can't be assembled locally; clear any left over from an earlier request
+    return {"transport_output": output.data, "transport_candidates": []}
     
     
-async get_final_agent(state: State, writer) -> Dict[str, Any]:
+async def get_final_agent(state: State, writer) -> Dict[str, Any]:
     user_details = state['user_details']
-    event_results = state['event_output']
-    venue_results = state['venue_output']
-    stay_results = state['stay_output']
-    transport_results = state['transport_output']
-    
-    prompt = f"""
-    I am planning to go from my location ({user_details.get('location)}) to a
+    event_results = state.get('event_output')
+    venue_results = state.get('venue_output')
+    stay_results = state.get('stay_output')
+    transport_results = state.get('transport_output')
+
+    # Combine the top candidates of each branch locally; the model only writes short summaries
+    plans = assemble_plans(
+        user_details,
+        state.get('activity_candidates', []),
+        state.get('stay_candidates', []),
+        state.get('transport_candidates', []),
+    )
+    if plans:
+        # The stay/transport agents' own suggestions still reach the user, e.g. transport
+        # options that came back as free text and so have no structured candidates
+        request = {"plans": json.dumps([skeleton_summary(plan) for plan in plans], default=str)}
+        if stay_results:
+            request["stay_suggestions"] = stay_results
+        if transport_results:
+            request["transport_suggestions"] = transport_results
+        prompt = assemble_user_prompt("Write one summary per plan skeleton below, in order.", request)
+        output = await plan_summary_agent.run(prompt)
+        prompt_cache_stats.record_usage("plan_summary", output.usage())
+        summaries = output.data + [""] * (len(plans) - len(output.data))
+        final_output = render_plans(plans, summaries)
+        writer(final_output)
+        return {"final_output": final_output}
+
+    # Nothing structured to assemble from: fall back to full synthesis from the raw outputs
+    prompt = assemble_user_prompt(
+        "Create 3-4 plan options from the search results below.",
+        {
+            "user_details": json.dumps(user_details, sort_keys=True),
+            "events": event_results,
+            "venues": venue_results,
+            "stay": stay_results,
+            "transport": transport_results,
+        },
+    )
     
     # Call the final agent
-    output = await get_final_agent.run(prompt, deps=FinalPreferences)
+    output = await final_agent.run(prompt)
+    prompt_cache_stats.record_usage("final", output.usage())
+    writer(output.data)
     
     return {"final_output": output.data}
     
@@ -277,13 +470,13 @@ def sports_events_agent_graph():
     "Building and returning the graph"
     graph = StateGraph(State)
     
-    graph.add_node("collect_user_info", collect_user_info())
-    graph.add_node("get_chat_message", get_chat_message())
-    graph.add_node("get_venue_agent", get_venue_agent())
-    graph.add_node("get_transport_agent", get_transport_agent())
-    graph.add_node("get_stay_agent", get_stay_agent())
-    graph.add_node("get_unified_event_agent", get_unified_event_agent())
-    graph.add_node("get_final_agent", get_final_agent())
+    graph.add_node("collect_user_info", collect_user_info)
+    graph.add_node("get_chat_message", get_chat_message)
+    graph.add_node("get_venue_agent", get_venue_agent)
+    graph.add_node("get_transport_agent", get_transport_agent)
+    graph.add_node("get_stay_agent", get_stay_agent)
+    graph.add_node("get_unified_event_agent", get_unified_event_agent)
+    graph.add_node("get_final_agent", get_final_agent)
     
     
     # edges
@@ -291,18 +484,23 @@ def sports_events_agent_graph():
     
     graph.add_conditional_edges("collect_user_info", route_userinfo, ["get_chat_message", "get_venue_agent", "get_unified_event_agent"])
     
-    graph.add_edge("get_chat_message", "get_userinfo_agent")
+    graph.add_edge("get_chat_message", "collect_user_info")
     graph.add_conditional_edges("get_venue_agent",route_to_all, ["get_transport_agent", "get_stay_agent"])
     graph.add_conditional_edges("get_unified_event_agent",route_to_all, ["get_transport_agent", "get_stay_agent"])
     graph.add_edge("get_transport_agent", "get_final_agent")
     graph.add_edge("get_stay_agent", "get_final_agent")
    
-    graph.add_edge(get_final_agent(), END)
+    graph.add_edge("get_final_agent", END)
     
     memory = MemorySaver()
-    return graph.compile(checkpoint=memory)
+    return graph.compile(checkpointer=memory)
 
 sports_event_agent_graph = sports_events_agent_graph()
+
+
+def start_diagnostics() -> Optional[Diagnostics]:
+    """Opt-in memory diagnostics (DIAGNOSTICS=1) on DIAGNOSTICS_PORT; call once from the worker's entry point."""
+    return start_diagnostics_from_env(sports_event_agent_graph.checkpointer)
     
 
     
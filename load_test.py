@@ -0,0 +1,344 @@
+"""Load generator for the sports events graph.
+
+Replays synthetic multi-turn conversations (collect_user_info -> get_chat_message ->
+interrupt -> resume) against the compiled graph, with fake model and MCP backends,
+at a target arrival rate. Reports throughput, per-turn tail latency, checkpoint
+growth, the number of open child processes over time, per-agent prompt cache usage
+and the resilience layer's per-caller metrics (fake models run through ResilientModel).
+
+    python load_test.py --rate 5 --duration 60 --model-latency 0.2
+"""
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, AsyncIterator, Dict, List
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("LLM_API_KEY", "load-test")
+
+from langgraph.types import Command
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+
+import mcp_client
+import graph as graph_module
+from diagnostics import checkpoint_sizes, count_child_processes
+from model import ResilientModel
+from prompts import prompt_cache_stats
+from resilience import metrics_report
+from config_registry import config_registry
+from agents import sports_venue_agent, stay_agent, transport_agent, unified_event_agent
+from agents.final_agent import get_final_agent, get_plan_summary_agent
+from agents.information_agent import get_userinfo_agent
+
+
+STUB_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_mcp.py")
+
+
+# One template per intent in information_agent.system_prompt: an opening message,
+# the clarifications a user typically sends, and the details the agent ends up with
+CONVERSATION_TEMPLATES: Dict[str, Dict[str, Any]] = {
+    "book_game_venue": {
+        "opening": "I want to play {game_name} this weekend",
+        "clarifications": ["In {location}", "On {user_date_first}", "Evening works best"],
+        "details": {"game_name": "football", "location": "Pune"},
+    },
+    "book_game_event": {
+        "opening": "Are there any {game_name} tournaments I can watch?",
+        "clarifications": ["Around {location}", "From {user_date_first} to {user_date_last}", "I'll be coming from {origin}"],
+        "details": {"game_name": "kabaddi", "location": "Mumbai", "origin": "Pune"},
+    },
+    "book_fitness_event": {
+        "opening": "Looking for a {fitness_type} session",
+        "clarifications": ["Somewhere in {location}", "On {user_date_first} morning"],
+        "details": {"fitness_type": "yoga", "location": "Bengaluru"},
+    },
+    "book_tech_event": {
+        "opening": "Any {event_name} happening soon?",
+        "clarifications": ["It's in {location}", "Between {user_date_first} and {user_date_last}", "Travelling from {origin}, paid is fine"],
+        "details": {"event_name": "AI conference", "location": "Hyderabad", "origin": "Bangalore"},
+    },
+    "book_general_event": {
+        "opening": "I'd like to go to a {event_name}",
+        "clarifications": ["In {location}", "On {user_date_first}"],
+        "details": {"event_name": "music festival", "location": "Delhi"},
+    },
+}
+
+
+@dataclass
+class Conversation:
+    thread_id: str
+    intent: str
+    details: Dict[str, Any]
+    turns: List[str]
+    think_times: List[float]
+    turn: int = 0
+
+
+@dataclass
+class LoadTestStats:
+    started: int = 0
+    completed: int = 0
+    failed: int = 0
+    turn_latencies: Dict[int, List[float]] = field(default_factory=dict)
+    samples: List[Dict[str, float]] = field(default_factory=list)
+
+
+current_conversation: ContextVar[Conversation] = ContextVar("current_conversation")
+
+
+def synthesize_conversation(index: int, max_clarifications: int, mean_think_time: float) -> Conversation:
+    intent = random.choice(list(CONVERSATION_TEMPLATES))
+    template = CONVERSATION_TEMPLATES[intent]
+    first = date(2026, 11, 1) + timedelta(days=random.randint(0, 30))
+    last = first + timedelta(days=random.randint(0, 2))
+    details = {
+        "intent": intent,
+        "game_name": "",
+        "event_name": "",
+        "fitness_type": "",
+        "origin": None,
+        "user_date_first": first.isoformat(),
+        "user_date_last": last.isoformat() if random.random() < 0.5 else None,
+        **template["details"],
+    }
+    clarifications = template["clarifications"][:random.randint(0, min(max_clarifications, len(template["clarifications"])))]
+    turns = [text.format(**details) for text in [template["opening"], *clarifications]]
+    return Conversation(
+        thread_id=f"load-{index}",
+        intent=intent,
+        details=details,
+        turns=turns,
+        think_times=[random.expovariate(1 / mean_think_time) if mean_think_time else 0.0 for _ in turns],
+    )
+
+
+def userinfo_args(conversation: Conversation) -> Dict[str, Any]:
+    """The UserInfo the fake model returns: complete only on the conversation's last turn."""
+    complete = conversation.turn >= len(conversation.turns) - 1
+    return {
+        **conversation.details,
+        "all_details_given": complete,
+        "response": "Got it, searching now." if complete else "Could you share a few more details?",
+    }
+
+
+def output_tool_name(info: AgentInfo) -> str:
+    tools = getattr(info, "output_tools", None) or info.result_tools
+    return tools[0].name
+
+
+def build_fake_models(model_latency: float) -> tuple[FunctionModel, FunctionModel, FunctionModel]:
+    """Fake models for the info agent (structured UserInfo), the plan summary agent and every text agent."""
+    async def userinfo_function(messages: List[ModelMessage], info: AgentInfo) -> ModelResponse:
+        await asyncio.sleep(model_latency)
+        args = userinfo_args(current_conversation.get())
+        return ModelResponse(parts=[ToolCallPart(tool_name=output_tool_name(info), args=args)])
+
+    async def userinfo_stream(messages: List[ModelMessage], info: AgentInfo) -> AsyncIterator[Dict[int, DeltaToolCall]]:
+        await asyncio.sleep(model_latency)
+        raw = json.dumps(userinfo_args(current_conversation.get()))
+        yield {0: DeltaToolCall(name=output_tool_name(info))}
+        for i in range(0, len(raw), 8):
+            await asyncio.sleep(0.002)
+            yield {0: DeltaToolCall(json_args=raw[i:i + 8])}
+
+    async def summary_function(messages: List[ModelMessage], info: AgentInfo) -> ModelResponse:
+        await asyncio.sleep(model_latency)
+        summaries = [f"Synthetic summary {i} for {current_conversation.get().intent}." for i in range(1, 5)]
+        return ModelResponse(parts=[ToolCallPart(tool_name=output_tool_name(info), args={"response": summaries})])
+
+    async def text_function(messages: List[ModelMessage], info: AgentInfo) -> ModelResponse:
+        await asyncio.sleep(model_latency)
+        return ModelResponse(parts=[TextPart(f"Synthetic suggestions for {current_conversation.get().intent}.")])
+
+    async def text_stream(messages: List[ModelMessage], info: AgentInfo) -> AsyncIterator[str]:
+        await asyncio.sleep(model_latency)
+        yield f"Synthetic suggestions for {current_conversation.get().intent}."
+
+    return (
+        FunctionModel(userinfo_function, stream_function=userinfo_stream),
+        FunctionModel(summary_function),
+        FunctionModel(text_function, stream_function=text_stream),
+    )
+
+
+class FakeMCPClient:
+    """Stands in for mcp_client.MCPClient (also inside the client pool).
+
+    Each started client owns one stub server process (bench_mcp.py --serve), so the
+    child process count tracks real client lifetimes; it exposes no tools.
+    """
+
+    latency: float = 0.0
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        self.servers: List[Any] = []
+        self.tools: List[Any] = []
+        self.process: asyncio.subprocess.Process | None = None
+
+    def load_servers(self, config_path: str) -> None:
+        pass
+
+    def load_config(self, config: Dict[str, Any]) -> None:
+        pass
+
+    async def start(self) -> List[Any]:
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, STUB_SERVER, "--serve",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL,
+        )
+        await asyncio.sleep(self.latency)
+        return self.tools
+
+    def tools_for(self, result_transform: Any = None) -> List[Any]:
+        return self.tools
+
+    async def cleanup(self) -> None:
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        # Closing stdin ends the stub's read loop; terminate is the fallback
+        process.stdin.close()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=2.0)
+        except asyncio.TimeoutError:
+            process.terminate()
+            await process.wait()
+
+
+def install_fake_backends(text_model: FunctionModel, mcp_latency: float) -> None:
+    """Point every agent factory at the fake model and every MCP client at FakeMCPClient."""
+    FakeMCPClient.latency = mcp_latency
+    mcp_client.MCPClient = FakeMCPClient
+    # The checked-in configs may be placeholders; give every agent a (fake) config to lease
+    for name in ("venue", "stay", "transport", *unified_event_agent.INTENT_CONFIG_MAP.values()):
+        config_registry.register(name, {"mcpServers": {}})
+    for module in (sports_venue_agent, stay_agent, transport_agent, unified_event_agent):
+        module.model = ResilientModel(text_model, "stay")  # Only stay_agent uses its module-level model
+        module.get_openai_model = lambda caller_name: ResilientModel(text_model, caller_name)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run_conversation(compiled_graph: Any, conversation: Conversation, stats: LoadTestStats) -> None:
+    current_conversation.set(conversation)
+    config = {"configurable": {"thread_id": conversation.thread_id}}
+    stats.started += 1
+    try:
+        for turn, text in enumerate(conversation.turns):
+            conversation.turn = turn
+            await asyncio.sleep(conversation.think_times[turn])
+            payload = {"user_input": text, "messages": []} if turn == 0 else Command(resume=text)
+            started = time.perf_counter()
+            async for _ in compiled_graph.astream(payload, config, stream_mode="custom"):
+                pass
+            stats.turn_latencies.setdefault(turn, []).append(time.perf_counter() - started)
+        stats.completed += 1
+    except Exception as e:
+        stats.failed += 1
+        print(f"{conversation.thread_id} failed on turn {conversation.turn}: {e!r}")
+
+
+def take_sample(compiled_graph: Any, stats: LoadTestStats, started: float) -> None:
+    threads = checkpoint_sizes(compiled_graph.checkpointer).values()
+    stats.samples.append({
+        "t": time.perf_counter() - started,
+        "checkpoints": sum(thread["checkpoints"] for thread in threads),
+        "checkpoint_bytes": sum(thread["bytes"] for thread in threads),
+        "child_processes": count_child_processes(),
+        "conversations_in_flight": stats.started - stats.completed - stats.failed,
+    })
+
+
+async def sample_resources(compiled_graph: Any, stats: LoadTestStats, started: float, interval: float) -> None:
+    while True:
+        take_sample(compiled_graph, stats, started)
+        await asyncio.sleep(interval)
+
+
+async def run_load_test(args: argparse.Namespace) -> LoadTestStats:
+    userinfo_model, summary_model, text_model = build_fake_models(args.model_latency)
+    install_fake_backends(text_model, args.mcp_latency)
+    compiled_graph = graph_module.sports_event_agent_graph
+
+    stats = LoadTestStats()
+    started = time.perf_counter()
+    sampler = asyncio.create_task(sample_resources(compiled_graph, stats, started, args.sample_interval))
+
+    tasks = []
+    with (
+        get_userinfo_agent.override(model=ResilientModel(userinfo_model, "userinfo")),
+        get_plan_summary_agent.override(model=ResilientModel(summary_model, "plan_summary")),
+        get_final_agent.override(model=ResilientModel(text_model, "final")),
+    ):
+        index = 0
+        # Poisson arrivals at the target rate
+        while time.perf_counter() - started < args.duration:
+            conversation = synthesize_conversation(index, args.max_clarifications, args.think_time)
+            tasks.append(asyncio.create_task(run_conversation(compiled_graph, conversation, stats)))
+            index += 1
+            await asyncio.sleep(random.expovariate(args.rate))
+        await asyncio.gather(*tasks)
+
+    sampler.cancel()
+    take_sample(compiled_graph, stats, started)
+    return stats
+
+
+def print_report(stats: LoadTestStats) -> None:
+    elapsed = stats.samples[-1]["t"] if stats.samples else 0.0
+    turns = sum(len(latencies) for latencies in stats.turn_latencies.values())
+    print(f"\nConversations: {stats.completed} completed, {stats.failed} failed, {stats.started} started in {elapsed:.1f}s")
+    print(f"Throughput: {stats.completed / elapsed if elapsed else 0:.2f} conversations/s, {turns / elapsed if elapsed else 0:.2f} turns/s")
+
+    print("\nTurn  count     p50 ms     p95 ms     p99 ms")
+    for turn in sorted(stats.turn_latencies):
+        latencies = stats.turn_latencies[turn]
+        print(f"{turn:>4}  {len(latencies):>5}  {percentile(latencies, 50) * 1000:>9.1f}  {percentile(latencies, 95) * 1000:>9.1f}  {percentile(latencies, 99) * 1000:>9.1f}")
+
+    print("\n     t  checkpoints  checkpoint KB  child procs  in flight")
+    for sample in stats.samples:
+        print(f"{sample['t']:>6.1f}  {sample['checkpoints']:>11}  {sample['checkpoint_bytes'] / 1024:>13.1f}  {sample['child_processes']:>11}  {sample['conversations_in_flight']:>9}")
+
+    print("\nAgent           runs  request tokens  cached tokens  cached ratio  prompt variants")
+    for name, agent in sorted(prompt_cache_stats.report().items()):
+        print(f"{name:<14}  {agent['runs']:>4}  {agent['request_tokens']:>14}  {agent['cached_tokens']:>13}  {agent['cached_ratio']:>12.3f}  {agent['system_prompt_variants']:>15}")
+
+    print("\nCaller            calls  failures  retries  timeouts  hedges won/started  p95 ms")
+    for name, caller in sorted(metrics_report().items()):
+        p95 = caller["p95_latency"] * 1000 if caller["p95_latency"] is not None else 0.0
+        hedges = f"{caller['hedges_won']}/{caller['hedges_started']}"
+        print(f"{name:<16}  {caller['calls']:>5}  {caller['failures']:>8}  {caller['retries']:>7}  {caller['timeouts']:>8}  {hedges:>18}  {p95:>6.1f}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay synthetic conversations against the sports events graph.")
+    parser.add_argument("--rate", type=float, default=2.0, help="Target conversation arrival rate per second.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to keep starting new conversations.")
+    parser.add_argument("--max-clarifications", type=int, default=3, help="Upper bound on clarification turns per conversation.")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean user think time between turns, in seconds.")
+    parser.add_argument("--model-latency", type=float, default=0.1, help="Latency of each fake model call, in seconds.")
+    parser.add_argument("--mcp-latency", type=float, default=0.05, help="Startup latency of each fake MCP client, in seconds.")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="Seconds between resource samples.")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible runs.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    random.seed(args.seed)
+    print_report(asyncio.run(run_load_test(args)))
@@ -4,24 +4,71 @@ from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 from mcp.types import Tool as MCPTool
 from contextlib import AsyncExitStack
-from typing import Any, List
+from mcp_transport import PipelinedSession
+from resilience import ResiliencePolicy, get_caller
+from diagnostics import track
+from typing import Any, Callable, List
 import asyncio
 import logging
 import shutil
 import json
+import time
 import os
 
+# Applied to each tool result with the arguments of the call that produced it
+ResultTransform = Callable[[Any, dict[str, Any]], Any]
+
 logging.basicConfig(
     level=logging.ERROR, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+class ToolResultCache:
+    """In-memory TTL cache for MCP tool results, keyed by server, tool and arguments.
+
+    Shared across MCPClient instances so repeated lookups (routes, durations, ...)
+    are served locally instead of going through the MCP server again.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600.0, max_entries: int = 4096) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: dict[str, tuple[float, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(server_name: str, tool_name: str, arguments: dict[str, Any]) -> str:
+        return json.dumps([server_name, tool_name, arguments], sort_keys=True, default=str)
+
+    def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: str, value: Any) -> None:
+        if len(self._entries) >= self.max_entries:
+            # Drop the oldest insertion; dicts keep insertion order
+            self._entries.pop(next(iter(self._entries)))
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+
+
 class MCPClient:
     """Manages connections to one or more MCP servers based on mcp_config.json"""
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        tool_cache: ToolResultCache | None = None,
+        result_transform: ResultTransform | None = None,
+    ) -> None:
         self.servers: List[MCPServer] = []
         self.config: dict[str, Any] = {}
         self.tools: List[Any] = []
+        self.tool_cache = tool_cache
+        self.result_transform = result_transform
         self.exit_stack = AsyncExitStack()
 
     def load_servers(self, config_path: str) -> None:
@@ -32,9 +79,20 @@ class MCPClient:
             config_path: Path to the JSON configuration file.
         """
         with open(config_path, "r") as config_file:
-            self.config = json.load(config_file)
+            self.load_config(json.load(config_file))
+
+    def load_config(self, config: dict[str, Any]) -> None:
+        """Create an instance of each server from an already parsed configuration
+        (e.g. one held by the config registry), without touching the disk.
 
-        self.servers = [MCPServer(name, config) for name, config in self.config["mcpServers"].items()]
+        Args:
+            config: Parsed configuration with an "mcpServers" mapping.
+        """
+        self.config = config
+        self.servers = [
+            MCPServer(name, server_config, tool_cache=self.tool_cache)
+            for name, server_config in self.config["mcpServers"].items()
+        ]
 
     async def start(self) -> List[PydanticTool]:
         """Starts each MCP server and returns the tools for each server formatted for Pydantic AI."""
@@ -42,7 +100,7 @@ class MCPClient:
         for server in self.servers:
             try:
                 await server.initialize()
-                tools = await server.create_pydantic_ai_tools()
+                tools = await server.create_pydantic_ai_tools(self.result_transform)
                 self.tools += tools
             except Exception as e:
                 logging.error(f"Failed to initialize server: {e}")
@@ -51,6 +109,19 @@ class MCPClient:
 
         return self.tools
 
+    def tools_for(self, result_transform: ResultTransform | None = None) -> List[PydanticTool]:
+        """Tools of the already started servers, with a per-caller result_transform.
+
+        Lets several requests share one set of running servers while each applies its own transform.
+        Servers without a live session contribute no tools.
+        """
+        return [
+            server.create_tool_instance(tool, result_transform)
+            for server in self.servers
+            if server.session is not None
+            for tool in server.mcp_tools
+        ]
+
     async def cleanup_servers(self) -> None:
         """Clean up all servers properly."""
         for server in self.servers:
@@ -73,13 +144,21 @@ class MCPClient:
 class MCPServer:
     """Manages MCP server connections and tool execution."""
 
-    def __init__(self, name: str, config: dict[str, Any]) -> None:
+    def __init__(
+        self,
+        name: str,
+        config: dict[str, Any],
+        tool_cache: ToolResultCache | None = None,
+    ) -> None:
         self.name: str = name
         self.config: dict[str, Any] = config
+        self.tool_cache: ToolResultCache | None = tool_cache
+        self.mcp_tools: List[MCPTool] = []
         self.stdio_context: Any | None = None
-        self.session: ClientSession | None = None
+        self.session: ClientSession | PipelinedSession | None = None
         self._cleanup_lock: asyncio.Lock = asyncio.Lock()
         self.exit_stack: AsyncExitStack = AsyncExitStack()
+        track("MCPServer", self)
 
     async def initialize(self) -> None:
         """Initialize the server connection."""
@@ -91,6 +170,14 @@ class MCPServer:
         if command is None:
             raise ValueError("The command must be a valid string and cannot be None.")
 
+        # The caller outlives any one config version (it keeps the breaker state and metrics);
+        # a client started from a reloaded config brings its "resilience" block with it
+        get_caller(f"mcp:{self.name}", breaker=True).policy = self.resilience_policy()
+
+        if self.config.get("transport") == "pipelined":
+            await self.initialize_pipelined(command)
+            return
+
         server_params = StdioServerParameters(
             command=command,
             args=self.config["args"],
@@ -108,26 +195,85 @@ class MCPServer:
             )
             await session.initialize()
             self.session = session
+            track("ClientSession", session)
         except Exception as e:
             logging.error(f"Error initializing server {self.name}: {e}")
             await self.cleanup()
             raise
 
-    async def create_pydantic_ai_tools(self) -> List[PydanticTool]:
+    async def initialize_pipelined(self, command: str) -> None:
+        """Initialize the server over a PipelinedSession instead of the stdio_client/ClientSession pair.
+
+        Enabled with "transport": "pipelined" in the server config; "batch": true also sends
+        concurrent requests as JSON-RPC batches when the server's protocol version allows it.
+        """
+        session = PipelinedSession(
+            command,
+            self.config["args"],
+            env=self.config["env"] if self.config.get("env") else None,
+            batch=self.config.get("batch", False),
+        )
+        try:
+            self.exit_stack.push_async_callback(session.close)
+            await session.start()
+            await session.initialize()
+            self.session = session
+            track("ClientSession", session)
+        except Exception as e:
+            logging.error(f"Error initializing server {self.name}: {e}")
+            await self.cleanup()
+            raise
+
+    async def create_pydantic_ai_tools(self, result_transform: ResultTransform | None = None) -> List[PydanticTool]:
         """Convert MCP tools to pydantic_ai Tools."""
-        tools = (await self.session.list_tools()).tools
-        return [self.create_tool_instance(tool) for tool in tools]            
+        self.mcp_tools = (await self.session.list_tools()).tools
+        return [self.create_tool_instance(tool, result_transform) for tool in self.mcp_tools]
+
+    async def call_tool(self, tool_name: str, arguments: dict[str, Any]) -> Any:
+        """Call a tool on this server, serving repeated calls from the tool cache if one is set."""
+        if self.tool_cache is None:
+            result = await self.call_tool_uncached(tool_name, arguments)
+        else:
+            key = ToolResultCache.make_key(self.name, tool_name, arguments)
+            result = self.tool_cache.get(key)
+            if result is None:
+                result = await self.call_tool_uncached(tool_name, arguments)
+                if not getattr(result, "isError", False):
+                    self.tool_cache.put(key, result)
+        return result
+
+    async def call_tool_uncached(self, tool_name: str, arguments: dict[str, Any]) -> Any:
+        """Call the tool through this server's shared resilience layer (retries, circuit breaker, optional hedging)."""
+        caller = get_caller(f"mcp:{self.name}", self.resilience_policy(), breaker=True)
+        return await caller.call(lambda: self.session.call_tool(tool_name, arguments=arguments))
+
+    def resilience_policy(self) -> ResiliencePolicy:
+        """Policy from the optional "resilience" block of the server config.
+
+        Tools may not be idempotent, so retries and hedging are both off unless the
+        server's tools are safe to call twice ("attempts": 3, "hedge": true).
+        """
+        return ResiliencePolicy(**{"attempts": 1, **self.config.get("resilience", {})})
+
+    def create_tool_instance(self, tool: MCPTool, result_transform: ResultTransform | None = None) -> PydanticTool:
+        """Initialize a Pydantic AI Tool from an MCP Tool.
+
+        Fields of the run's deps that the tool declares in its input schema fill in any
+        arguments the model left out. The raw result is what gets cached; result_transform
+        (if any) is applied on every call.
+        """
+        properties = (tool.inputSchema or {}).get("properties", {})
 
-    def create_tool_instance(self, tool: MCPTool) -> PydanticTool:
-        """Initialize a Pydantic AI Tool from an MCP Tool."""
-        async def execute_tool(**kwargs: Any) -> Any:
-            return await self.session.call_tool(tool.name, arguments=kwargs)
+        async def execute_tool(ctx: RunContext[Any], **kwargs: Any) -> Any:
+            if ctx.deps is not None:
+                defaults = {key: value for key, value in vars(ctx.deps).items() if key in properties}
+                kwargs = {**defaults, **kwargs}
+            result = await self.call_tool(tool.name, kwargs)
+            if result_transform is not None:
+                result = result_transform(result, kwargs)
+            return result
 
         async def prepare_tool(ctx: RunContext, tool_def: ToolDefinition) -> ToolDefinition | None:
-            if ctx.deps:
-                deps_dict = ctx.deps.__dict__
-                tool_def.default_input.update(deps_dict)
-                
             tool_def.parameters_json_schema = tool.inputSchema
             return tool_def
         
@@ -0,0 +1,208 @@
+from mcp.client.stdio import get_default_environment
+from mcp.types import CallToolResult, InitializeResult, ListToolsResult
+from typing import Any, Dict, List, Optional
+import asyncio
+import itertools
+import json
+import logging
+
+try:
+    import orjson
+
+    def dumps(message: Any) -> bytes:
+        return orjson.dumps(message)
+
+    loads = orjson.loads
+except ImportError:
+    def dumps(message: Any) -> bytes:
+        return json.dumps(message, separators=(",", ":")).encode()
+
+    loads = json.loads
+
+
+PROTOCOL_VERSION = "2025-03-26"
+
+# JSON-RPC batching is only part of this MCP protocol revision
+BATCH_PROTOCOL_VERSIONS = {"2025-03-26"}
+
+# Large tool results arrive as a single line; the default 64 KiB stream limit is too small
+STREAM_LIMIT = 32 * 1024 * 1024
+
+
+class JSONRPCError(Exception):
+    """An error response returned by an MCP server."""
+
+    def __init__(self, code: int, message: str, data: Any = None) -> None:
+        super().__init__(f"{message} (code {code})")
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+class PipelinedSession:
+    """A minimal MCP client session over stdio that pipelines concurrent requests.
+
+    Requests issued concurrently are queued and flushed together in one write (as a
+    JSON-RPC batch when the server supports it) and their responses are matched back
+    by id, so several tool calls in one agent step share a single round trip. Uses
+    orjson when installed and reuses one write buffer for every flush.
+
+    Exposes the subset of ClientSession used by MCPServer: initialize, list_tools, call_tool.
+    """
+
+    def __init__(
+        self,
+        command: str,
+        args: List[str],
+        env: Optional[Dict[str, str]] = None,
+        batch: bool = False,
+        max_batch: int = 64,
+    ) -> None:
+        self.command = command
+        self.args = args
+        self.env = env
+        self.batch_requested = batch
+        self.batch = False
+        self.max_batch = max_batch
+        self.process: asyncio.subprocess.Process | None = None
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._outgoing: List[Dict[str, Any]] = []
+        self._wakeup = asyncio.Event()
+        self._buffer = bytearray()
+        self._tasks: List[asyncio.Task] = []
+        self._closed: Optional[Exception] = None
+
+    async def start(self) -> None:
+        self.process = await asyncio.create_subprocess_exec(
+            self.command,
+            *self.args,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            # Same as stdio_client: the config's env extends a safe default environment
+            env={**get_default_environment(), **self.env} if self.env is not None else get_default_environment(),
+            limit=STREAM_LIMIT,
+        )
+        self._tasks = [
+            asyncio.create_task(self._write_loop()),
+            asyncio.create_task(self._read_loop()),
+        ]
+
+    async def initialize(self) -> InitializeResult:
+        result = InitializeResult.model_validate(await self._request("initialize", {
+            "protocolVersion": PROTOCOL_VERSION,
+            "capabilities": {},
+            "clientInfo": {"name": "sports-events-companion", "version": "0.1.0"},
+        }))
+        self.batch = self.batch_requested and result.protocolVersion in BATCH_PROTOCOL_VERSIONS
+        self._send({"jsonrpc": "2.0", "method": "notifications/initialized"})
+        return result
+
+    async def list_tools(self) -> ListToolsResult:
+        return ListToolsResult.model_validate(await self._request("tools/list", {}))
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> CallToolResult:
+        return CallToolResult.model_validate(await self._request("tools/call", {"name": name, "arguments": arguments or {}}))
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._shutdown(ConnectionError("MCP session closed"))
+        if self.process is None:
+            return
+        if self.process.stdin and not self.process.stdin.is_closing():
+            self.process.stdin.close()
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout=2.0)
+        except asyncio.TimeoutError:
+            self.process.kill()
+            await self.process.wait()
+
+    def _send(self, message: Dict[str, Any]) -> None:
+        self._outgoing.append(message)
+        self._wakeup.set()
+
+    async def _request(self, method: str, params: Dict[str, Any]) -> Any:
+        if self._closed is not None:
+            raise ConnectionError(f"MCP session is closed: {self._closed}")
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._send({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+        try:
+            return await future
+        finally:
+            # A cancelled caller (e.g. a resilience timeout) would otherwise leave its entry behind
+            self._pending.pop(request_id, None)
+
+    async def _write_loop(self) -> None:
+        try:
+            await self._write_messages()
+        except Exception as e:
+            logging.error(f"MCP write loop failed: {e!r}")
+            self._shutdown(ConnectionError(f"Writing to the MCP server failed: {e!r}"))
+
+    async def _write_messages(self) -> None:
+        stdin = self.process.stdin
+        while True:
+            await self._wakeup.wait()
+            # Yield once so calls issued in the same step join this flush
+            await asyncio.sleep(0)
+            self._wakeup.clear()
+            messages, self._outgoing = self._outgoing, []
+
+            self._buffer.clear()
+            if self.batch and len(messages) > 1:
+                for i in range(0, len(messages), self.max_batch):
+                    self._buffer += dumps(messages[i:i + self.max_batch])
+                    self._buffer += b"\n"
+            else:
+                for message in messages:
+                    self._buffer += dumps(message)
+                    self._buffer += b"\n"
+
+            # The transport copies anything it can't write immediately, so the buffer is safe to reuse
+            stdin.write(self._buffer)
+            await stdin.drain()
+
+    async def _read_loop(self) -> None:
+        stdout = self.process.stdout
+        try:
+            while line := await stdout.readline():
+                try:
+                    payload = loads(line)
+                except ValueError:
+                    logging.warning(f"Ignoring malformed MCP message: {line[:200]!r}")
+                    continue
+                for message in payload if isinstance(payload, list) else [payload]:
+                    self._dispatch(message)
+        finally:
+            self._shutdown(ConnectionError("MCP server closed the connection"))
+
+    def _dispatch(self, message: Dict[str, Any]) -> None:
+        if "method" in message:
+            # Server-to-client request or notification; only ping needs an answer
+            if "id" in message:
+                if message["method"] == "ping":
+                    self._send({"jsonrpc": "2.0", "id": message["id"], "result": {}})
+                else:
+                    self._send({"jsonrpc": "2.0", "id": message["id"], "error": {"code": -32601, "message": "Method not found"}})
+            return
+
+        future = self._pending.pop(message.get("id"), None)
+        if future is None or future.done():
+            return
+        if "error" in message:
+            error = message["error"]
+            future.set_exception(JSONRPCError(error.get("code", -32603), error.get("message", ""), error.get("data")))
+        else:
+            future.set_result(message.get("result"))
+
+    def _shutdown(self, error: Exception) -> None:
+        """Mark the session unusable and fail every request still waiting for a response."""
+        if self._closed is None:
+            self._closed = error
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
@@ -1,6 +1,12 @@
+import asyncio
 import os
 from dotenv import load_dotenv
-from pydantic_ai.openai import OpenAIModel
+from openai import APIConnectionError, AsyncOpenAI
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.models.openai import OpenAIModel
+from pydantic_ai.providers.openai import OpenAIProvider
+from pydantic_ai.models.wrapper import WrapperModel
+from resilience import ResiliencePolicy, get_caller
 
 load_dotenv()  # Load environment variables from .env
 
@@ -11,10 +17,44 @@ BASE_URL = os.getenv("BASE_URL")
 if not OPENAI_API_KEY:
     raise EnvironmentError("LLM_API_KEY is missing in the .env file")
 
-def get_openai_model():
+# Shared by every agent: deadline-aware retries, plus hedging of slow model requests when LLM_HEDGE=true
+LLM_POLICY = ResiliencePolicy(
+    attempts=int(os.getenv("LLM_ATTEMPTS", "3")),
+    deadline=float(os.getenv("LLM_DEADLINE_SECONDS", "90")),
+    attempt_timeout=float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "45")),
+    hedge=os.getenv("LLM_HEDGE", "false").lower() == "true",
+    hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "95")),
+)
+
+
+def is_transient_llm_error(error: Exception) -> bool:
+    """Timeouts, dropped connections, rate limits and 5xx are retried; other 4xx errors won't get better."""
+    if isinstance(error, (asyncio.TimeoutError, APIConnectionError)):
+        return True
+    return isinstance(error, ModelHTTPError) and (error.status_code == 429 or error.status_code >= 500)
+
+
+class ResilientModel(WrapperModel):
+    """Runs non-streaming model requests through the shared resilience layer.
+
+    Each agent gets its own caller (llm:<caller_name>), so latency samples and metrics
+    aren't mixed across prompts of very different sizes. Streaming requests are passed
+    through unchanged, since a stream can't be retried once it has started producing output.
+    """
+
+    def __init__(self, wrapped, caller_name: str):
+        super().__init__(wrapped)
+        self.caller_name = caller_name
+
+    async def request(self, *args, **kwargs):
+        caller = get_caller(f"llm:{self.caller_name}", LLM_POLICY, retryable=is_transient_llm_error)
+        return await caller.call(lambda: self.wrapped.request(*args, **kwargs))
+
+
+def get_openai_model(caller_name: str = "default"):
     
-    return OpenAIModel(
-        model=MODEL_NAME,
-        base_url = BASE_URL,
-        api_key=OPENAI_API_KEY
-    )
+    return ResilientModel(OpenAIModel(
+        MODEL_NAME,
+        # Retries happen in ResilientModel, within the deadline; the SDK's own would stack on top
+        provider=OpenAIProvider(openai_client=AsyncOpenAI(base_url=BASE_URL, api_key=OPENAI_API_KEY, max_retries=0))
+    ), caller_name)
@@ -0,0 +1,100 @@
+from dataclasses import asdict, dataclass, field, is_dataclass
+from typing import Any, Dict, Iterable, List, Optional
+import hashlib
+import json
+
+
+def sorted_tools(tools: Iterable[Any]) -> List[Any]:
+    """Tools in a stable (by name) order, so tool schemas serialize identically on every run."""
+    return sorted(tools, key=lambda tool: tool.name)
+
+
+def describe_tools(tools: Iterable[Any]) -> str:
+    return "\n".join(
+        f"- {tool.name}: {(tool.description or 'No description provided').strip()}"
+        for tool in sorted_tools(tools)
+    )
+
+
+def serialize_deps(deps: Any) -> str:
+    """Byte-stable JSON for agent dependencies (sorted keys, fixed separators)."""
+    if deps is None:
+        return "{}"
+    if is_dataclass(deps) and not isinstance(deps, type):
+        deps = asdict(deps)
+    elif hasattr(deps, "model_dump"):
+        deps = deps.model_dump()
+    elif hasattr(deps, "__dict__"):
+        deps = vars(deps)
+    return json.dumps(deps, sort_keys=True, separators=(", ", ": "), default=str)
+
+
+def assemble_system_prompt(instructions: str, tools: Iterable[Any] = (), context: str = "") -> str:
+    """Static instructions first, then tool descriptions in a stable order, then any variable context.
+
+    Keeping the variable part last lets providers reuse the cached prompt prefix across runs.
+    """
+    parts = [instructions.strip()]
+    tool_descriptions = describe_tools(tools)
+    if tool_descriptions:
+        parts.append(f"Use the following tools:\n{tool_descriptions}")
+    if context:
+        parts.append(context.strip())
+    return "\n\n".join(parts) + "\n"
+
+
+def assemble_user_prompt(instructions: str, request: Dict[str, Any], deps: Any = None) -> str:
+    """Static task instructions first, then per-request fields and preferences at the end."""
+    lines = [instructions.strip(), ""]
+    lines += [f"{key}: {value}" for key, value in request.items()]
+    if deps is not None:
+        lines.append(f"preferences: {serialize_deps(deps)}")
+    return "\n".join(lines)
+
+
+@dataclass
+class AgentPromptStats:
+    runs: int = 0
+    request_tokens: int = 0
+    cached_tokens: int = 0
+    system_prompt_hashes: set = field(default_factory=set)
+
+    @property
+    def cached_ratio(self) -> float:
+        return self.cached_tokens / self.request_tokens if self.request_tokens else 0.0
+
+
+class PromptCacheStats:
+    """Tracks cached-prefix token ratios (as reported by the provider) per agent.
+
+    Also counts distinct system prompts per agent; more than one means the prefix isn't stable.
+    """
+
+    def __init__(self) -> None:
+        self.agents: Dict[str, AgentPromptStats] = {}
+
+    def record_system_prompt(self, agent_name: str, system_prompt: str) -> None:
+        stats = self.agents.setdefault(agent_name, AgentPromptStats())
+        stats.system_prompt_hashes.add(hashlib.sha256(system_prompt.encode()).hexdigest())
+
+    def record_usage(self, agent_name: str, usage: Any) -> None:
+        stats = self.agents.setdefault(agent_name, AgentPromptStats())
+        stats.runs += 1
+        stats.request_tokens += getattr(usage, "request_tokens", None) or 0
+        details: Optional[Dict[str, int]] = getattr(usage, "details", None)
+        stats.cached_tokens += (details or {}).get("cached_tokens", 0)
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {
+                "runs": stats.runs,
+                "request_tokens": stats.request_tokens,
+                "cached_tokens": stats.cached_tokens,
+                "cached_ratio": round(stats.cached_ratio, 3),
+                "system_prompt_variants": len(stats.system_prompt_hashes),
+            }
+            for name, stats in self.agents.items()
+        }
+
+
+prompt_cache_stats = PromptCacheStats()
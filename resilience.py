@@ -0,0 +1,235 @@
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+import asyncio
+import logging
+import random
+import time
+
+
+@dataclass
+class ResiliencePolicy:
+    """How a single logical call is retried, bounded and hedged."""
+
+    attempts: int = 3
+    deadline: float = 60.0  # seconds for the whole call, retries included
+    attempt_timeout: float = 30.0  # seconds for a single attempt
+    base_delay: float = 0.2
+    max_delay: float = 5.0
+    hedge: bool = False
+    hedge_percentile: float = 95.0
+    min_samples_for_hedge: int = 20
+
+    def __post_init__(self) -> None:
+        if self.attempts < 1:
+            raise ValueError(f"attempts must be at least 1, got {self.attempts}")
+
+
+@dataclass
+class ResilienceMetrics:
+    calls: int = 0
+    failures: int = 0
+    retries: int = 0
+    timeouts: int = 0
+    hedges_started: int = 0
+    hedges_won: int = 0
+    circuit_rejections: int = 0
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while a circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures; lets one trial call through after reset_timeout."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "open" or (state == "half_open" and self._trial_in_flight):
+            raise CircuitOpenError("Circuit breaker is open")
+        if state == "half_open":
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def release_trial(self) -> None:
+        """Give up a half-open trial without an outcome (cancelled, or an error that says nothing about health)."""
+        self._trial_in_flight = False
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies, used to pick the hedging delay."""
+
+    def __init__(self, window: int = 200) -> None:
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class ResilientCaller:
+    """Deadline-aware retries with jittered backoff, hedged duplicates and an optional circuit breaker.
+
+    retryable decides which exceptions are worth another attempt (all of them by default);
+    anything else is raised at once and doesn't count against the circuit breaker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        policy: ResiliencePolicy,
+        breaker: Optional[CircuitBreaker] = None,
+        retryable: Optional[Callable[[Exception], bool]] = None,
+    ) -> None:
+        self.name = name
+        self.policy = policy
+        self.breaker = breaker
+        self.retryable = retryable
+        self.latencies = LatencyTracker()
+        self.metrics = ResilienceMetrics()
+
+    async def call(self, make_call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run make_call (a factory for a fresh awaitable per attempt) under this caller's policy."""
+        policy = self.policy
+        self.metrics.calls += 1
+        deadline = time.monotonic() + policy.deadline
+        for attempt in range(policy.attempts):
+            if self.breaker is not None:
+                try:
+                    self.breaker.before_call()
+                except CircuitOpenError:
+                    self.metrics.circuit_rejections += 1
+                    raise CircuitOpenError(f"Circuit breaker for {self.name} is open")
+
+            remaining = deadline - time.monotonic()
+            started = time.monotonic()
+            try:
+                result = await self._attempt(make_call, min(policy.attempt_timeout, remaining))
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.metrics.timeouts += 1
+                if self.retryable is not None and not self.retryable(e):
+                    if self.breaker is not None:
+                        self.breaker.release_trial()
+                    self.metrics.failures += 1
+                    raise
+                if self.breaker is not None:
+                    self.breaker.record_failure()
+
+                # Full jitter backoff, but never sleep past the deadline
+                delay = random.uniform(0, min(policy.max_delay, policy.base_delay * 2 ** attempt))
+                if attempt + 1 >= policy.attempts or time.monotonic() + delay >= deadline:
+                    self.metrics.failures += 1
+                    raise
+                logging.warning(f"{self.name} attempt {attempt + 1} failed ({e!r}), retrying in {delay:.2f}s")
+                self.metrics.retries += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled mid-attempt: don't leave a half-open breaker waiting on a trial forever
+                if self.breaker is not None:
+                    self.breaker.release_trial()
+                raise
+
+            self.latencies.record(time.monotonic() - started)
+            if self.breaker is not None:
+                self.breaker.record_success()
+            return result
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.policy.hedge or len(self.latencies.samples) < self.policy.min_samples_for_hedge:
+            return None
+        return self.latencies.percentile(self.policy.hedge_percentile)
+
+    async def _attempt(self, make_call: Callable[[], Awaitable[Any]], timeout: float) -> Any:
+        """One attempt: the primary call, plus a duplicate if it outlives the hedge delay."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        primary = asyncio.ensure_future(make_call())
+        tasks = {primary}
+        error: Optional[BaseException] = None
+        try:
+            hedge_delay = self._hedge_delay()
+            if hedge_delay is not None and hedge_delay < timeout:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                if not done:
+                    self.metrics.hedges_started += 1
+                    tasks.add(asyncio.ensure_future(make_call()))
+
+            while tasks:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError(f"{self.name} timed out after {timeout:.1f}s")
+                done, _ = await asyncio.wait(tasks, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError(f"{self.name} timed out after {timeout:.1f}s")
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.metrics.hedges_won += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+# Shared across all agents and MCP servers, keyed by caller name
+callers: Dict[str, ResilientCaller] = {}
+
+
+def get_caller(
+    name: str,
+    policy: Optional[ResiliencePolicy] = None,
+    breaker: bool = False,
+    retryable: Optional[Callable[[Exception], bool]] = None,
+) -> ResilientCaller:
+    """Return the shared caller for name, creating it with policy (and a circuit breaker) on first use."""
+    if name not in callers:
+        callers[name] = ResilientCaller(name, policy or ResiliencePolicy(), CircuitBreaker() if breaker else None, retryable)
+    return callers[name]
+
+
+def metrics_report() -> Dict[str, Dict[str, Any]]:
+    """Per-caller metrics, including how often hedged requests actually won."""
+    report = {}
+    for name, caller in callers.items():
+        metrics = asdict(caller.metrics)
+        metrics["hedge_win_rate"] = round(caller.metrics.hedges_won / caller.metrics.hedges_started, 3) if caller.metrics.hedges_started else 0.0
+        metrics["p95_latency"] = caller.latencies.percentile(95)
+        if caller.breaker is not None:
+            metrics["circuit_state"] = caller.breaker.state
+        report[name] = metrics
+    return report
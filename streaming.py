@@ -0,0 +1,168 @@
+from typing import Any, Optional
+import re
+import time
+
+
+JSON_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+HEX4 = re.compile(r"[0-9a-fA-F]{4}")
+
+# Stands in for malformed \u escapes and unpaired surrogates
+REPLACEMENT_CHAR = "\ufffd"
+
+
+class StreamedFieldDecoder:
+    """Incrementally decodes one string field out of a tool call's partial JSON arguments.
+
+    Only the new characters of the field are decoded on each feed, so streaming a
+    structured output doesn't require re-validating the whole model per chunk.
+    """
+
+    def __init__(self, field: str) -> None:
+        self.field = field
+        self.value = ""
+        self.done = False
+        self._key = f'"{field}"'
+        self._key_pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        # The key has arrived but not yet the opening quote of its value
+        self._partial_key_pattern = re.compile(r'"%s"\s*(?::\s*)?\Z' % re.escape(field))
+        self._cursor: Optional[int] = None
+        self._scan_from = 0
+
+    def feed(self, message: Any) -> str:
+        """Consume the latest partial model response and return the newly streamed text."""
+        args = self._tool_call_args(message)
+        if args is None or self.done:
+            return ""
+        if isinstance(args, dict):
+            value = args.get(self.field) or ""
+            delta = value[len(self.value):] if value.startswith(self.value) else ""
+            self.value = value
+            return delta
+        return self._decode(args)
+
+    @staticmethod
+    def _tool_call_args(message: Any) -> str | dict | None:
+        for part in reversed(getattr(message, "parts", [])):
+            if getattr(part, "part_kind", None) == "tool-call":
+                return part.args
+        return None
+
+    def _decode(self, raw: str) -> str:
+        if self._cursor is None:
+            # Only search what arrived since the last feed, plus anything that may still be the key
+            match = self._key_pattern.search(raw, self._scan_from)
+            if match is None:
+                key_at = raw.rfind(self._key, self._scan_from)
+                if key_at != -1 and self._partial_key_pattern.match(raw, key_at):
+                    self._scan_from = key_at
+                else:
+                    self._scan_from = max(self._scan_from, len(raw) - len(self._key) + 1)
+                return ""
+            self._cursor = match.end()
+
+        decoded = []
+        i = self._cursor
+        while i < len(raw):
+            char = raw[i]
+            if char == '"':
+                self.done = True
+                i += 1
+                break
+            if char != "\\":
+                decoded.append(char)
+                i += 1
+                continue
+            # Escape sequence; wait for more input if it is cut off
+            if i + 1 >= len(raw):
+                break
+            escape = raw[i + 1]
+            if escape == "u":
+                if i + 6 > len(raw):
+                    break
+                char, consumed = self._unicode_escape(raw, i)
+                if char is None:
+                    break
+                decoded.append(char)
+                i += consumed
+            else:
+                decoded.append(JSON_ESCAPES.get(escape, escape))
+                i += 2
+
+        self._cursor = i
+        delta = "".join(decoded)
+        self.value += delta
+        return delta
+
+    @staticmethod
+    def _unicode_escape(raw: str, i: int) -> tuple[Optional[str], int]:
+        """Decode the \\uXXXX escape at raw[i] (joining surrogate pairs) into (char, length).
+
+        Returns (None, 0) when the low half of a surrogate pair hasn't arrived yet.
+        """
+        if not HEX4.fullmatch(raw, i + 2, i + 6):
+            return REPLACEMENT_CHAR, 6
+        code = int(raw[i + 2:i + 6], 16)
+        if 0xDC00 <= code <= 0xDFFF:
+            return REPLACEMENT_CHAR, 6
+        if not 0xD800 <= code <= 0xDBFF:
+            return chr(code), 6
+
+        rest = raw[i + 6:i + 12]
+        if len(rest) < 6 and "\\u".startswith(rest[:2]):
+            return None, 0
+        if rest.startswith("\\u") and HEX4.fullmatch(rest, 2):
+            low = int(rest[2:], 16)
+            if 0xDC00 <= low <= 0xDFFF:
+                return chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)), 12
+        return REPLACEMENT_CHAR, 6
+
+
+class AdaptiveDebouncer:
+    """Decides when to flush streamed text, coalescing more as the token rate rises.
+
+    Slow streams are flushed chunk by chunk; fast streams are flushed at most every
+    interval, which grows with the smoothed character rate up to max_interval.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = 0.01,
+        max_interval: float = 0.1,
+        reference_rate: float = 200.0,
+        smoothing: float = 0.3,
+    ) -> None:
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.reference_rate = reference_rate
+        self.smoothing = smoothing
+        self.rate = 0.0
+        self._last_arrival: Optional[float] = None
+        self._last_flush = 0.0
+
+    @property
+    def interval(self) -> float:
+        return min(self.max_interval, self.min_interval * max(1.0, self.rate / self.reference_rate))
+
+    def ready(self, chars: int, now: Optional[float] = None) -> bool:
+        """Record chars arriving now and return True if pending text should be flushed."""
+        now = time.monotonic() if now is None else now
+        if self._last_arrival is not None and chars:
+            elapsed = max(now - self._last_arrival, 1e-6)
+            self.rate = (1 - self.smoothing) * self.rate + self.smoothing * (chars / elapsed)
+        if chars:
+            self._last_arrival = now
+
+        if now - self._last_flush >= self.interval:
+            self._last_flush = now
+            return True
+        return False